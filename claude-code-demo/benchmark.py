@@ -0,0 +1,295 @@
+"""
+Offline benchmark of the agent runner.
+
+Runs the real pipeline of main.py (workspaces, metadata, diffs, scheduling,
+retries, journal and telemetry) against synthesized local repositories, a
+stand-in for the PR metadata and a fake agent, so it needs no GitHub access,
+Claude CLI or network. Reports PRs/hour, stage timings and worker idle time
+per concurrency setting.
+
+    python benchmark.py --prs 40 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import time
+import uuid
+
+import anyio
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock
+
+import main
+from utils.dataset_util import get_full_repo_pr_id, load_dataset
+from utils.diff_util import DiffService
+from utils.journal_util import STATUS_SUCCESS, ProgressJournal
+from utils.model import PRDataItem
+from utils.claude_code_util import load_config
+from utils.scheduler_util import AdaptiveRateLimiter, AdmissionController, build_admission
+from utils.telemetry_util import TelemetryRecorder
+from utils.workspace_util import WorkspaceManager
+
+LANGUAGE_EXTENSIONS = {
+    "Python": "py", "Java": "java", "JavaScript": "js", "TypeScript": "ts", "Go": "go",
+    "Rust": "rs", "C": "c", "C++": "cpp", "C#": "cs", "PHP": "php",
+}
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com",
+}
+
+
+def _git(args: list[str], cwd: str) -> str:
+    result = subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True,
+                            env={**os.environ, **GIT_ENV})
+    return result.stdout.strip()
+
+
+def synthesize_repos(dataset: list[PRDataItem], remote_root: str) -> list[PRDataItem]:
+    """
+    Create one local bare repo per dataset repository with a base commit and,
+    per PR, a commit changing change_line_count lines of a source file in the
+    PR's language, published as refs/pull/<id>/head
+    :return: the dataset with source/target commits pointing at the synthesized commits
+    """
+    by_repo: dict[str, list[PRDataItem]] = {}
+    for item in dataset:
+        by_repo.setdefault(get_full_repo_pr_id(item.githubPrUrl)[0], []).append(item)
+
+    synthesized = []
+    for repo, items in by_repo.items():
+        bare = os.path.join(remote_root, repo + ".git")
+        work = os.path.join(remote_root, "_work", repo)
+        os.makedirs(bare)
+        _git(['init', '--bare', '-q'], bare)
+        # serve commits by id and partial fetches, like GitHub does
+        _git(['config', 'uploadpack.allowAnySHA1InWant', 'true'], bare)
+        _git(['config', 'uploadpack.allowFilter', 'true'], bare)
+        os.makedirs(work)
+        _git(['init', '-q'], work)
+        for item in items:
+            _, pr_id = get_full_repo_pr_id(item.githubPrUrl)
+            ext = LANGUAGE_EXTENSIONS.get(item.project_main_language, "txt")
+            with open(os.path.join(work, f"pr_{pr_id}.{ext}"), "w") as f:
+                f.writelines(f"line {i}\n" for i in range(max(item.change_line_count, 1)))
+        _git(['add', '-A'], work)
+        _git(['commit', '-q', '-m', 'base'], work)
+        base = _git(['rev-parse', 'HEAD'], work)
+        _git(['push', '-q', bare, 'HEAD:refs/heads/main'], work)
+
+        for item in items:
+            _, pr_id = get_full_repo_pr_id(item.githubPrUrl)
+            ext = LANGUAGE_EXTENSIONS.get(item.project_main_language, "txt")
+            _git(['checkout', '-q', '--detach', base], work)
+            changed = max(item.change_line_count, 1)
+            with open(os.path.join(work, f"pr_{pr_id}.{ext}"), "w") as f:
+                # half of the changed lines rewritten, the other half added
+                f.writelines(f"changed {i}\n" if i < changed // 2 else f"line {i}\n" for i in range(changed))
+                f.writelines(f"added {i}\n" for i in range(changed - changed // 2))
+            _git(['commit', '-q', '-am', f'PR {pr_id}'], work)
+            head = _git(['rev-parse', 'HEAD'], work)
+            _git(['push', '-q', bare, f'HEAD:refs/pull/{pr_id}/head'], work)
+            synthesized.append(item.model_copy(update={"source_commit": base, "target_commit": head}))
+    shutil.rmtree(os.path.join(remote_root, "_work"))
+    return synthesized
+
+
+class FakeMetadataStore:
+    """
+    Stand-in for PRMetadataStore, answers without network after a fixed latency
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def get_title_desc(self, repo: str, pr_id: str) -> tuple[str, str]:
+        time.sleep(self.latency)
+        return f"Benchmark PR {repo}#{pr_id}", "Synthesized pull request for the offline benchmark."
+
+
+class FakeAgent:
+    """
+    Stand-in for claude_agent_sdk.query: sleeps for a time proportional to the
+    changed lines announced in the prompt, writes comments.txt in the
+    BASE_PROMPT tag format and reports a ResultMessage. Failures, rate limits
+    and hung sessions are injected with the given probabilities.
+    """
+
+    def __init__(self, base_seconds: float = 1.0, seconds_per_line: float = 0.005, failure_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, hang_rate: float = 0.0, seed: int = 0):
+        self.base_seconds = base_seconds
+        self.seconds_per_line = seconds_per_line
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.hang_rate = hang_rate
+        self.random = random.Random(seed)
+
+    def _result(self, start: float, is_error: bool, result: str) -> ResultMessage:
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        turns = self.random.randint(3, 15)
+        return ResultMessage(
+            subtype="error_during_execution" if is_error else "success", duration_ms=elapsed_ms,
+            duration_api_ms=int(elapsed_ms * 0.8), is_error=is_error, num_turns=turns,
+            session_id=str(uuid.uuid4()), total_cost_usd=round(turns * 0.01, 4),
+            usage={"input_tokens": turns * 4000, "output_tokens": turns * 300}, result=result
+        )
+
+    async def query(self, prompt: str, options):
+        start = time.monotonic()
+        stats = re.search(r"files changed, \+(\d+) -(\d+)", prompt)
+        lines = int(stats.group(1)) + int(stats.group(2)) if stats else 100
+        roll = self.random.random()
+        if roll < self.hang_rate:
+            await anyio.sleep_forever()
+        await anyio.sleep(self.base_seconds + self.seconds_per_line * lines)
+        roll -= self.hang_rate
+        if roll < self.rate_limit_rate:
+            yield AssistantMessage(content=[TextBlock("rate limited")], model="fake", error="rate_limit")
+            yield self._result(start, True, "rate limited")
+            return
+        roll -= self.rate_limit_rate
+        if roll < self.failure_rate:
+            yield self._result(start, True, "injected failure")
+            return
+
+        files = re.findall(r"^- (\S+) \(modified", prompt, re.MULTILINE)
+        notes = []
+        for path in files[:self.random.randint(1, 3)]:
+            line = self.random.randint(1, 20)
+            notes.append(f"<path>{path}</path>\n<side>right</side>\n<from>{line}</from>\n<to>{line + 2}</to>\n"
+                         f"<note>Possible issue near line {line}.</note>\n<notesplit />\n")
+        if notes:
+            with open(os.path.join(options.cwd, "comments.txt"), "w", encoding="utf-8") as f:
+                f.write("".join(notes))
+        yield self._result(start, False, f"wrote {len(notes)} comments")
+
+
+def run_setting(dataset: list[PRDataItem], workers: int, args: argparse.Namespace, root: str,
+                admission: AdmissionController | None = None) -> dict:
+    """
+    Run the pipeline once with the given number of workers on a fresh workspace root,
+    or with one worker per session the admission controller may admit
+    """
+    if admission is not None:
+        workers = admission.max_sessions
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    main.workspace_manager = WorkspaceManager(root=root, fetch_strategy=args.fetch_strategy)
+    main.metadata_store = FakeMetadataStore(args.metadata_latency)
+    main.diff_service = DiffService(cache_dir=os.path.join(root, "diffs"))
+    main.comments_dir = os.path.join(root, "comments")
+    main.query = FakeAgent(args.agent_base, args.agent_per_line, args.failure_rate,
+                           args.rate_limit_rate, args.hang_rate, args.seed).query
+    journal = ProgressJournal(os.path.join(root, "progress.jsonl"))
+    telemetry = TelemetryRecorder(os.path.join(root, "telemetry.jsonl"))
+    rate_limiter = AdaptiveRateLimiter(backoff_base=args.backoff_base, backoff_max=args.backoff_base * 8)
+
+    start = time.monotonic()
+    anyio.run(main.run_tasks, dataset, journal, workers, args.prefetch, args.prepare_workers,
+              args.max_retries, 0.0, rate_limiter, telemetry, None, args.timeout, None, args.schedule, admission)
+    wall = time.monotonic() - start
+
+    records = telemetry.records
+    succeeded = len({r.pr_url for r in records if r.status == STATUS_SUCCESS})
+    stage_means = {stage: round(seconds / max(len(records), 1), 3)
+                   for stage, seconds in telemetry.summary()["stage_seconds"].items()}
+    busy = sum(r.agent_seconds or 0.0 for r in records)
+    return {
+        "workers": workers,
+        "adaptive": admission is not None,
+        "prs": len(dataset),
+        "succeeded": succeeded,
+        "failed": len(dataset) - succeeded,
+        "attempts": len(records),
+        "wall_seconds": round(wall, 2),
+        "prs_per_hour": round(succeeded / wall * 3600, 1) if wall > 0 else 0.0,
+        "stage_mean_seconds": stage_means,
+        "agent_busy_seconds": round(busy, 2),
+        # share of worker time not spent inside an agent session
+        "idle_ratio": round(1 - busy / (workers * wall), 3) if wall > 0 else 0.0,
+    }
+
+
+def print_report(results: list[dict]):
+    print("=" * 60)
+    print("Benchmark")
+    print("=" * 60)
+    print(f"{'workers':>7} {'ok/all':>9} {'wall s':>8} {'PRs/h':>8} {'idle':>6}  stage means (s)")
+    for r in results:
+        workers = f"<={r['workers']}" if r["adaptive"] else r["workers"]
+        print(f"{workers:>7} {r['succeeded']:>4}/{r['prs']:<4} {r['wall_seconds']:>8} "
+              f"{r['prs_per_hour']:>8} {r['idle_ratio']:>6.1%}  {r['stage_mean_seconds']}")
+
+
+def prepare_bench_dir(bench_dir: str):
+    """
+    Run from the benchmark directory with the review agent definition main.py
+    copies into every workspace, a placeholder if the demo has none
+    """
+    agent_dir = os.path.join(bench_dir, ".claude", "agents")
+    os.makedirs(agent_dir)
+    agent_path = os.path.join(".claude", "agents", "code-reviewer.md")
+    if os.path.exists(agent_path):
+        shutil.copy(agent_path, agent_dir)
+    else:
+        with open(os.path.join(agent_dir, "code-reviewer.md"), "w", encoding="utf-8") as f:
+            f.write("---\nname: code-reviewer\ndescription: Benchmark placeholder\n---\n")
+    os.chdir(bench_dir)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent runner")
+    parser.add_argument("--dataset", default="../dataset/positive_samples.json", help="dataset the PRs are modelled on")
+    parser.add_argument("--prs", type=int, default=20, help="number of PRs to sample from the dataset")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="concurrency settings to compare")
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--prepare-workers", type=int, default=2)
+    parser.add_argument("--max-retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None, help="per-PR agent timeout in seconds")
+    parser.add_argument("--schedule", default="longest-first", choices=["longest-first", "file"])
+    parser.add_argument("--fetch-strategy", default="partial", choices=["partial", "full"])
+    parser.add_argument("--agent-base", type=float, default=1.0, help="fake agent seconds per session")
+    parser.add_argument("--agent-per-line", type=float, default=0.005, help="fake agent seconds per changed line")
+    parser.add_argument("--metadata-latency", type=float, default=0.05, help="stand-in metadata seconds per PR")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of sessions that never finish")
+    parser.add_argument("--backoff-base", type=float, default=1.0)
+    parser.add_argument("--adaptive", action="store_true",
+                        help="also run with the admission controller of configs/config.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench", help="benchmark working directory")
+    args = parser.parse_args()
+    if args.hang_rate and args.timeout is None:
+        parser.error("--hang-rate needs --timeout")
+
+    bench_dir = os.path.abspath(args.output)
+    shutil.rmtree(bench_dir, ignore_errors=True)
+    remote_root = os.path.join(bench_dir, "remotes")
+    dataset = load_dataset(args.dataset)
+    prepare_bench_dir(bench_dir)
+    dataset = random.Random(args.seed).sample(dataset, min(args.prs, len(dataset)))
+    dataset = synthesize_repos(dataset, remote_root)
+    # github.com urls of the dataset resolve to the synthesized repos
+    os.environ.update({"GIT_CONFIG_COUNT": "1",
+                       "GIT_CONFIG_KEY_0": f"url.file://{remote_root}/.insteadOf",
+                       "GIT_CONFIG_VALUE_0": "https://github.com/"})
+
+    results = []
+    for workers in args.workers:
+        results.append(run_setting(dataset, workers, args, os.path.join(bench_dir, f"workers_{workers}")))
+    if args.adaptive:
+        admission = build_admission(load_config().get("admission", {}))
+        results.append(run_setting(dataset, 0, args, os.path.join(bench_dir, "adaptive"), admission))
+    print_report(results)
+    with open(os.path.join(bench_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"report saved to {os.path.join(bench_dir, 'report.json')}")
+
+
+if __name__ == "__main__":
+    # run from the claude-code-demo directory, like main.py
+    main_benchmark()
@@ -1,22 +1,57 @@
+import argparse
 import json
 import os
+import shutil
+import sys
 import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 import anyio
+from anyio import to_thread
 from tqdm import tqdm
-from claude_agent_sdk import query, ResultMessage
+from claude_agent_sdk import query, AssistantMessage, CLIConnectionError, ProcessError, ResultMessage
 from utils.claude_code_util import get_claude_code_options, add_code_review_agent, load_config
-from utils.git_util import git_clone, checkout, git_fetch, get_pr_title_desc
-from utils.dataset_util import get_gitrepo_pr_id, load_dataset
-from utils.constants_util import BASE_PROMPT
+from utils.dataset_util import get_gitrepo_pr_id, get_full_repo_pr_id, load_dataset
+from utils.cost_util import CostModel, estimate_makespan, load_durations, order_longest_first
+from utils.constants_util import BASE_PROMPT, DIFF_APPENDIX, DIFF_PROMPT
+from utils.diff_util import DiffService, format_diff_summary
+from utils.model import PRDataItem
+from utils.journal_util import ProgressJournal, STATUS_SUCCESS, STATUS_FAILED
+from utils.metadata_util import PRMetadataStore
+from utils.runner_util import run_pipeline
+from utils.scheduler_util import AdaptiveRateLimiter, AdmissionController, BackendError, RateLimitedError, build_admission
+from utils.telemetry_util import PRTelemetry, TelemetryRecorder, count_comments
+from utils.workspace_util import WorkspaceManager
+
+if TYPE_CHECKING:
+    from utils.evaluation_util import StreamingEvaluator
+
+# evaluator_runner (shard assignment, evaluation) lives in the repository root;
+# it is imported lazily because it pulls in the matcher dependencies
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 task_data_path = "tmp_data.json"
+journal_path = "progress.jsonl"
+telemetry_path = "metrics/telemetry.jsonl"
+# seconds a cancelled session gets to shut its CLI subprocess down
+session_close_timeout = 30
+comments_dir = "comments"
+
+workspace_manager: WorkspaceManager | None = None
+metadata_store: PRMetadataStore | None = None
+diff_service: DiffService | None = None
+# none, files (changed file list) or summary (file list and hunks)
+diff_context = "summary"
+diff_max_chars = 20000
 
 
-def copy_comments(workspace: str, cp_id: str):
+def copy_comments(workspace: str, cp_id: str) -> str | None:
     """
     Copy the comments.txt from workspace
+    :return: path of the copied comments file, None if the agent wrote none
     """
     comments_path = os.path.join(workspace, "comments.txt")
     if os.path.exists(comments_path):
@@ -24,12 +59,16 @@ def copy_comments(workspace: str, cp_id: str):
             text = f.read()
     else:
         print("No comments.txt found, agent doesn't post comments.")
-        return
-    # write comments into comments_{cp_id}.txt under main.py directory
-    comments_dir = "comments"
+        return None
+    # write comments into comments_{cp_id}.txt under main.py directory,
+    # via a temp file so concurrent readers never see a partial file
     os.makedirs(comments_dir, exist_ok=True)
-    with open(os.path.join(comments_dir, "comments_%s.txt" % cp_id), "w", encoding="utf-8") as f:
+    output_path = os.path.join(comments_dir, "comments_%s.txt" % cp_id)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         f.write(text)
+    os.replace(tmp_path, output_path)
+    return output_path
 
 def create_agent(workspace: str):
     """
@@ -40,55 +79,352 @@ def create_agent(workspace: str):
         agent_md = f.read()
     add_code_review_agent(workspace, agent_md)
 
-def run_claude_code(pr_url: str, source: str, target: str):
+async def prepare_workspace(git_repo: str, pr_id: str, source: str, target: str,
+                            timings: dict[str, float] | None = None) -> str:
+    """
+    Create a worktree of the repo mirror at the target commit, with the hidden
+    source and target commits fetched
+    :param timings: if given, filled with the seconds spent per stage
+    :return: workspace path
+    """
+    workspace = await workspace_manager.create(git_repo, pr_id, source, target, timings)
+    try:
+        create_agent(workspace)
+    except BaseException:
+        # otherwise the worktree leaks and its mirror stays pinned
+        await workspace_manager.release(git_repo, workspace)
+        raise
+    return workspace
+
+@dataclass
+class PreparedPR:
+    """
+    Workspace and metadata of a PR, ready for an agent session
+    """
+    pr_url: str
+    git_repo: str
+    cp_id: str
+    workspace: str
+    title: str
+    desc: str
+    source: str
+    target: str
+    telemetry: PRTelemetry
+    diff_summary: str = ""
+
+    def prompt(self) -> str:
+        return BASE_PROMPT % (self.source, self.target, self.title, self.desc) + self.diff_summary
+
+async def load_diff_summary(workspace: str, full_repo: str, source: str, target: str) -> str:
     """
-    Run Claude Code
+    Get the cached (or freshly computed) diff of a PR, copy the full patch into
+    the workspace and render a size-bounded summary for the prompt
+    :return: prompt suffix, empty if diff context is disabled or the diff failed
+    """
+    if diff_context == "none":
+        return ""
+    try:
+        diff = await diff_service.get(workspace, full_repo, source, target)
+    except Exception as e:
+        print(f"diff of {full_repo} {source}...{target} failed, the agent will compute it: {e}")
+        return ""
+    patch_path = os.path.join(".claude", "pr" + DIFF_APPENDIX)
+    shutil.copyfile(diff_service.patch_path(full_repo, source, target), os.path.join(workspace, patch_path))
+    summary = format_diff_summary(diff, diff_max_chars, include_hunks=diff_context == "summary")
+    return DIFF_PROMPT % (diff.mode, patch_path, summary)
+
+async def prepare_pr(pr_url: str, source: str, target: str, telemetry: PRTelemetry | None = None) -> PreparedPR:
+    """
+    Prepare the workspace and fetch the metadata of a PR
     :param pr_url: GitHub pr url
     :param source: source commit
     :param target: target commit
+    :param telemetry: record collecting the stage timings of this attempt
     """
     git_repo, pr_id = get_gitrepo_pr_id(pr_url)
-    repo = git_repo.split("/")[-1].replace(".git", "")
-    full_repo = git_repo.split("/")[-2] + "/" + repo
-    pull_pr = "pull/" + pr_id
-    branch = "pr_" + pr_id
-
-    # clone the repo
-    workspace = git_clone(git_repo)
-    checkout(workspace, pull_pr, branch)  # set the workspace to the target branch
-    # fetch hidden commit
-    git_fetch(workspace, "origin", source)
-    git_fetch(workspace, "origin", target)
-    create_agent(workspace)
-
-    options = get_claude_code_options(workspace=workspace, allowed_tools=["Read", "Write", "Bash"])
-    title, desc = get_pr_title_desc(repo=full_repo, pr_id=pr_id)
-    async def call():
-        async for message in query(
-                prompt=BASE_PROMPT % (title, desc, source, target), options=options
-        ):
-            if type(message) is ResultMessage:
-                print(message.result)
-
-    anyio.run(call)
-    copy_comments(workspace, repo + "_" + pr_id)
+    full_repo, _ = get_full_repo_pr_id(pr_url)
+    repo = full_repo.split("/")[-1]
+    telemetry = telemetry or PRTelemetry(pr_url)
+
+    timings: dict[str, float] = {}
+    try:
+        workspace = await prepare_workspace(git_repo, pr_id, source, target, timings)
+    finally:
+        for stage, seconds in timings.items():
+            telemetry.add_stage(stage, seconds)
+    try:
+        with telemetry.stage("metadata"):
+            title, desc = await to_thread.run_sync(metadata_store.get_title_desc, full_repo, pr_id)
+        with telemetry.stage("diff"):
+            diff_summary = await load_diff_summary(workspace, full_repo, source, target)
+    except BaseException:
+        await workspace_manager.release(git_repo, workspace)
+        raise
+    return PreparedPR(pr_url, git_repo, repo + "_" + pr_id, workspace, title, desc, source, target, telemetry,
+                      diff_summary)
+
+async def run_claude_code(prepared: PreparedPR) -> str | None:
+    """
+    Run Claude Code on a prepared PR and remove its workspace afterwards
+    :param prepared: prepared PR
+    :return: path of the comments file, None if the agent wrote none
+    """
+    telemetry = prepared.telemetry
+    try:
+        options = get_claude_code_options(workspace=prepared.workspace, allowed_tools=["Read", "Write", "Bash"])
+        rate_limited = False
+        server_error = False
+        result = None
+
+        agent_start = time.monotonic()
+        messages = query(prompt=prepared.prompt(), options=options)
+        try:
+            async for message in messages:
+                if type(message) is AssistantMessage and message.error == "rate_limit":
+                    rate_limited = True
+                if type(message) is AssistantMessage and message.error == "server_error":
+                    server_error = True
+                if type(message) is ResultMessage:
+                    result = message
+                    telemetry.record_result(message)
+                    print(message.result)
+        except (CLIConnectionError, ProcessError) as e:
+            raise BackendError(f"agent transport failed while reviewing {prepared.pr_url}: {e}") from e
+        finally:
+            telemetry.agent_seconds = round(time.monotonic() - agent_start, 3)
+            # closing the stream terminates the CLI subprocess; shield it so
+            # this also happens when the session was cancelled by its deadline
+            with anyio.move_on_after(session_close_timeout, shield=True):
+                await messages.aclose()
+
+        if rate_limited:
+            raise RateLimitedError(f"rate limited while reviewing {prepared.pr_url}")
+        if server_error:
+            raise BackendError(f"agent backend error while reviewing {prepared.pr_url}")
+        if result is not None and result.subtype == "error_max_turns":
+            raise RuntimeError(f"agent session used up its turn budget after {result.num_turns} turns")
+        if result is not None and result.is_error:
+            raise RuntimeError(f"agent session ended with error: {result.result}")
+        output_path = copy_comments(prepared.workspace, prepared.cp_id)
+        telemetry.comment_count = count_comments(output_path)
+        return output_path
+    finally:
+        await workspace_manager.release(prepared.git_repo, prepared.workspace)
+
+async def run_tasks(dataset: list[PRDataItem], journal: ProgressJournal, workers: int, prefetch: int,
+                    prepare_workers: int, max_retries: int, retry_delay: float, rate_limiter: AdaptiveRateLimiter,
+                    telemetry: TelemetryRecorder, prepare_timeout: float | None = None,
+                    pr_timeout: float | None = None, evaluator: "StreamingEvaluator | None" = None,
+                    schedule: str = "longest-first", admission: AdmissionController | None = None):
+    if admission is not None:
+        # one review worker per session the host may ever admit
+        workers = admission.max_sessions
+        print(f"admission control: {admission.min_sessions}-{admission.max_sessions} concurrent sessions")
+    history = journal.replay()
+    finished = {url for url, event in history.items() if event["status"] == STATUS_SUCCESS}
+    journal.compact()
+    # skip finished task, from the journal or a legacy finish flag
+    pending = [item for item in dataset if not item.finish and item.githubPrUrl not in finished]
+    if schedule == "longest-first":
+        model = CostModel()
+        model.fit(dataset, load_durations(telemetry.path, history))
+        print(f"estimated run time in file order {estimate_makespan(pending, model, workers) / 3600:.1f}h")
+        pending = order_longest_first(pending, model)
+        print(f"estimated run time longest first {estimate_makespan(pending, model, workers) / 3600:.1f}h")
+    for item in pending:
+        workspace_manager.expect(get_gitrepo_pr_id(item.githubPrUrl)[0])
+    progress = tqdm(total=len(pending))
+    started: dict[str, float] = {}
+    outputs: dict[str, str | None] = {}
+    attempts: dict[str, int] = {}
+    ready_at: dict[str, float] = {}
+
+    async def prepare(item: PRDataItem) -> PreparedPR:
+        started.setdefault(item.githubPrUrl, time.monotonic())
+        attempts[item.githubPrUrl] = attempts.get(item.githubPrUrl, 0) + 1
+        record = telemetry.start(item.githubPrUrl, attempts[item.githubPrUrl])
+        try:
+            prepared = await prepare_pr(item.githubPrUrl, item.source_commit, item.target_commit, record)
+        except BaseException as e:
+            # also covers the cancellation of a timed out attempt
+            telemetry.finish(record, STATUS_FAILED, f"prepare: {type(e).__name__}: {e}")
+            raise
+        ready_at[item.githubPrUrl] = time.monotonic()
+        return prepared
+
+    async def review(item: PRDataItem, prepared: PreparedPR):
+        record = prepared.telemetry
+        # time the prepared PR waited for a review worker and a launch slot
+        record.add_stage("queued", time.monotonic() - ready_at.pop(item.githubPrUrl, time.monotonic()))
+        try:
+            outputs[item.githubPrUrl] = await run_claude_code(prepared)
+        except BaseException as e:
+            telemetry.finish(record, STATUS_FAILED, f"review: {type(e).__name__}: {e}")
+            raise
+        telemetry.finish(record, STATUS_SUCCESS)
+
+    async def on_finish(item: PRDataItem, success: bool, error: str | None):
+        progress.update(1)
+        workspace_manager.done(get_gitrepo_pr_id(item.githubPrUrl)[0])
+        duration = time.monotonic() - started.get(item.githubPrUrl, time.monotonic())
+        if not success:
+            print(f"give up {item.githubPrUrl}: {error}")
+            journal.record(item.githubPrUrl, STATUS_FAILED, duration, error=error)
+            return
+        print(f"finish {item.githubPrUrl}")
+        # save process
+        journal.record(item.githubPrUrl, STATUS_SUCCESS, duration, outputs.get(item.githubPrUrl))
+        if evaluator is not None:
+            await evaluator.submit(item.githubPrUrl, outputs.get(item.githubPrUrl))
+
+    async with evaluator or nullcontext():
+        if evaluator is not None:
+            # PRs finished by earlier runs reuse their results, or are scored
+            # from their recorded outputs
+            for item in dataset:
+                if item.githubPrUrl in finished:
+                    await evaluator.resume(item.githubPrUrl, history[item.githubPrUrl].get("output_path"))
+            if evaluator.reused:
+                print(f"reused {evaluator.reused} evaluation results of earlier runs")
+        report = await run_pipeline(
+            pending, prepare, review, workers, prefetch=prefetch, prepare_workers=prepare_workers,
+            max_retries=max_retries, retry_delay=retry_delay, prepare_timeout=prepare_timeout,
+            review_timeout=pr_timeout, rate_limiter=rate_limiter, admission=admission, on_finish=on_finish
+        )
+        if evaluator is not None:
+            print("agent sessions done, waiting for pending evaluations")
+    progress.close()
+    journal.compact()
+    print(f"done: {len(report['succeeded'])} succeeded, {len(report['failed'])} failed")
+    print(f"scheduler: {rate_limiter.stats}")
+    if admission is not None:
+        print(f"admission: {admission.stats}")
+    for pr_url in report["failed"]:
+        print(f"  failed: {pr_url} ({report['errors'][pr_url]})")
+    telemetry.print_summary()
+    if evaluator is not None:
+        print(f"evaluation: {evaluator.scoreboard.format_line()}, results saved to {evaluator.output_path}")
+
+def prefetch_metadata(dataset: list[PRDataItem]):
+    """
+    Fill the local PR metadata cache for the whole dataset
+    """
+    report = metadata_store.prefetch([get_full_repo_pr_id(item.githubPrUrl) for item in dataset])
+    print(f"prefetch done: {len(report['fetched'])} fetched, {len(report['failed'])} failed")
+
+def merge_shards(config: dict):
+    """
+    Merge the journals and evaluation results written by `--shard i/N` runs
+    into the single-node files
+    """
+    from evaluator_runner.merge_shards import merge_shard_results
+    from evaluator_runner.utils.sharding import shard_paths
+
+    path = config.get("journal_path", journal_path)
+    journals = shard_paths(path)
+    if journals:
+        count = ProgressJournal(path).merge(journals)
+        print(f"merged {len(journals)} journals into {path}: {count} PRs")
+    output_path = config.get("evaluation", {}).get("output_path", "results/evaluation_results.json")
+    results = shard_paths(output_path)
+    if results:
+        summary = merge_shard_results(results)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"merged {len(results)} evaluation results into {output_path}: "
+              f"{summary['evaluated_files']}/{summary['total_files']} evaluated")
 
 def main():
-    data_path = task_data_path
+    global workspace_manager, metadata_store, diff_service, diff_context, diff_max_chars
+    config = load_config()
+    workspace_manager = WorkspaceManager(
+        fetch_strategy=config.get("fetch_strategy", "partial"),
+        fetch_depth=config.get("fetch_depth", 1),
+        cache_budget_bytes=int(config["repo_cache_budget_gb"] * 2 ** 30) if config.get("repo_cache_budget_gb") else None
+    )
+    metadata_store = PRMetadataStore(
+        token=config.get("github_token"),
+        offline=config.get("offline_metadata", False)
+    )
+    diff_service = DiffService()
+    diff_context = config.get("diff_context", diff_context)
+    diff_max_chars = config.get("diff_max_chars", diff_max_chars)
+    parser = argparse.ArgumentParser(description="Run Claude Code review over the dataset")
+    parser.add_argument("command", nargs="?", default="run",
+                        choices=["run", "init", "prefetch-metadata", "merge-shards"],
+                        help="init: copy the raw dataset as task file; prefetch-metadata: cache PR titles "
+                             "and descriptions; run: review the PRs (default); merge-shards: merge the "
+                             "journals and evaluation results of sharded runs")
+    parser.add_argument("--workers", type=int, default=config.get("max_workers", 1),
+                        help="number of concurrent agent sessions")
+    parser.add_argument("--prefetch", type=int, default=config.get("prefetch", 2),
+                        help="number of PRs prepared ahead of the agent sessions")
+    parser.add_argument("--max-retries", type=int, default=config.get("max_retries", 0),
+                        help="extra attempts for a failed PR")
+    parser.add_argument("--timeout", type=float, default=config.get("pr_timeout"),
+                        help="seconds allowed for one agent session, unlimited if not set")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="admit agent sessions while the host has headroom instead of a fixed --workers")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="evaluate each PR as soon as its agent session finishes")
+    parser.add_argument("--shard", help="process only shard i of N, e.g. 2/4, assigned by a stable hash of the PR url")
+    parser.add_argument("--weighted", action="store_true",
+                        help="with --shard, balance the shards by change_line_count")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        load_data_as_task()
+        return
+    if args.command == "merge-shards":
+        merge_shards(config)
+        return
+
+    # the task file only carries legacy finish flags, progress lives in the journal
+    data_path = task_data_path if os.path.exists(task_data_path) else config.get("data_path")
     dataset = load_dataset(data_path)
+    if args.command == "prefetch-metadata":
+        prefetch_metadata(dataset)
+        return
     print("load dataset done, size:", len(dataset))
-    for item in tqdm(dataset):
-        if item.finish:
-            # skip finished task
-            continue
-        run_claude_code(item.githubPrUrl, item.source_commit, item.target_commit)
-        print(f"finish {item.githubPrUrl}")
-        item.finish = True
-        # save process
-        with open(data_path, "w", encoding="utf-8") as f:
-            json.dump([item.model_dump() for item in dataset], f, indent=4)
-        # sleep 30s to avoid network down
-        time.sleep(30)
+    shard = None
+    if args.shard:
+        from evaluator_runner.utils.sharding import parse_shard, select_shard
+        shard = parse_shard(args.shard)
+        dataset = select_shard(dataset, shard, key=lambda item: item.githubPrUrl,
+                               weight=(lambda item: item.change_line_count) if args.weighted else None)
+        print(f"shard {shard[0]}/{shard[1]}: {len(dataset)} PRs")
+
+    def path_of(path: str) -> str:
+        # each shard writes its own journal and outputs, merged by merge-shards
+        if shard is None:
+            return path
+        from evaluator_runner.utils.sharding import shard_path
+        return shard_path(path, shard)
+
+    journal = ProgressJournal(path_of(config.get("journal_path", journal_path)))
+    # launch sessions as fast as the budget allows, back off only on failures
+    rate_limiter = AdaptiveRateLimiter(
+        max_sessions=config.get("sessions_per_window"),
+        window=config.get("window_seconds", 60),
+        backoff_base=config.get("backoff_base", 30),
+        backoff_max=config.get("backoff_max", 900)
+    )
+    telemetry = TelemetryRecorder(path_of(config.get("telemetry_path", telemetry_path)))
+    admission = None
+    admission_config = config.get("admission", {})
+    if args.adaptive or admission_config.get("enabled"):
+        # size the session count to the host instead of a fixed --workers
+        admission = build_admission(admission_config)
+    evaluator = None
+    if args.evaluate:
+        from utils.evaluation_util import build_evaluator
+        evaluator = build_evaluator(config)
+        evaluator.output_path = path_of(evaluator.output_path)
+        evaluator.details_path = path_of(evaluator.details_path)
+    anyio.run(run_tasks, dataset, journal, args.workers, args.prefetch, config.get("prepare_workers", 2),
+              args.max_retries, config.get("retry_delay", 30), rate_limiter, telemetry,
+              config.get("prepare_timeout"), args.timeout, evaluator, config.get("schedule", "longest-first"),
+              admission)
 
 
 def load_data_as_task():
@@ -103,5 +439,5 @@ def load_data_as_task():
         json.dump([item.model_dump() for item in dataset], f, indent=4)
 
 if __name__ == "__main__":
-    # load_data_as_task()  # Copy initial data as task, only when you first run the script you need to run this
+    # run `python main.py init` first to copy initial data as task
     main()
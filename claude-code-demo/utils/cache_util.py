@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import time
+
+from anyio import to_thread
+
+
+def dir_size(path: str) -> int:
+    """
+    Bytes used by the files under a directory
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """
+    Disk budget for the repository mirrors under repos/.
+
+    Size and last use of every mirror are kept in an index file, so startup
+    only measures mirrors the index does not know. When the mirrors exceed the
+    budget, mirrors are evicted least recently used first, skipping pinned
+    mirrors (a worktree of them is in use). Mirrors no pending PR needs go
+    first; if that is not enough, mirrors with the fewest pending PRs are
+    evicted too and fetched again when they are needed.
+
+    All methods run on the event loop thread; eviction detaches a mirror with
+    a rename before deleting it in a worker thread, so a concurrent create()
+    never sees a half-deleted mirror.
+    """
+
+    def __init__(self, mirror_dir: str, budget_bytes: int | None = None, index_path: str | None = None):
+        self.mirror_dir = mirror_dir
+        self.budget_bytes = budget_bytes
+        self.index_path = index_path or os.path.join(mirror_dir, "index.json")
+        self.entries: dict[str, dict] = {}
+        self._pins: dict[str, int] = {}
+        self._pending: dict[str, int] = {}
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        # drop entries of mirrors removed by hand, measure mirrors the index misses
+        self.entries = {name: entry for name, entry in self.entries.items()
+                        if os.path.isdir(os.path.join(self.mirror_dir, name))}
+        if os.path.isdir(self.mirror_dir):
+            for name in os.listdir(self.mirror_dir):
+                path = os.path.join(self.mirror_dir, name)
+                if ".git.evicted." in name:
+                    # eviction interrupted before the delete finished
+                    shutil.rmtree(path, ignore_errors=True)
+                elif name.endswith(".git") and name not in self.entries and os.path.isdir(path):
+                    self.entries[name] = {"size": dir_size(path), "last_used": os.path.getmtime(path)}
+        self._save()
+
+    def _save(self):
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def pin(self, mirror: str):
+        """
+        Protect a mirror while a worktree of it is being created or used
+        """
+        name = os.path.basename(mirror)
+        self._pins[name] = self._pins.get(name, 0) + 1
+
+    def unpin(self, mirror: str):
+        name = os.path.basename(mirror)
+        self._pins[name] -= 1
+        if self._pins[name] == 0:
+            del self._pins[name]
+
+    def expect(self, mirror: str, count: int = 1):
+        """
+        Record that pending PRs will need a mirror
+        """
+        name = os.path.basename(mirror)
+        self._pending[name] = self._pending.get(name, 0) + count
+
+    def done(self, mirror: str):
+        """
+        Record that a pending PR of a mirror has finished
+        """
+        name = os.path.basename(mirror)
+        if self._pending.get(name, 0) > 1:
+            self._pending[name] -= 1
+        else:
+            self._pending.pop(name, None)
+
+    async def update(self, mirror: str):
+        """
+        Re-measure a mirror after it was created, fetched into or hydrated, and mark it used
+        """
+        name = os.path.basename(mirror)
+        size = await to_thread.run_sync(dir_size, mirror)
+        self.entries[name] = {"size": size, "last_used": time.time()}
+        self._save()
+
+    async def evict(self) -> list[str]:
+        """
+        Evict mirrors until the cache fits in its budget
+        :return: names of the evicted mirrors
+        """
+        if self.budget_bytes is None:
+            return []
+        total = self.total_bytes
+        candidates = sorted(
+            (name for name in self.entries if name not in self._pins),
+            key=lambda name: (self._pending.get(name, 0), self.entries[name]["last_used"])
+        )
+        victims = []
+        for name in candidates:
+            if total <= self.budget_bytes:
+                break
+            path = os.path.join(self.mirror_dir, name)
+            trash = f"{path}.evicted.{time.monotonic_ns()}"
+            os.replace(path, trash)
+            total -= self.entries.pop(name)["size"]
+            victims.append((name, trash))
+        if not victims:
+            if total > self.budget_bytes:
+                print(f"repo cache over budget ({total >> 20} MiB), all mirrors are in use")
+            return []
+        self._save()
+        for name, trash in victims:
+            print(f"evicted mirror {name}" + (f", needed by {self._pending[name]} pending PRs"
+                                              if name in self._pending else ""))
+            await to_thread.run_sync(shutil.rmtree, trash, True)
+        return [name for name, _ in victims]
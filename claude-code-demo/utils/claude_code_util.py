@@ -16,7 +16,8 @@ def get_claude_code_options(workspace: str, allowed_tools: list) -> ClaudeAgentO
     return ClaudeAgentOptions(
         allowed_tools=allowed_tools,
         cli_path=config.get("cli_path"),
-        cwd=workspace
+        cwd=workspace,
+        max_turns=config.get("max_turns")
     )
 
 def add_code_review_agent(workspace: str, agent_md: str):
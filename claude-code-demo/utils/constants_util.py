@@ -12,3 +12,5 @@ BASE_PROMPT = "Please conduct a code review for the changes from %s...%s, with P
               "<notesplit />\\n" \
               "**If you think there are no issues with the code, there's no need to create the file or write comments**. " \
               "If possible, use code-reviewer first."
+DIFF_PROMPT = "\\nThe changes were precomputed with git diff (%s), the full patch is at %s.\\n" \
+              "Summary of the changes:\\n%s\\n"
@@ -0,0 +1,137 @@
+import heapq
+import json
+import os
+
+from .dataset_util import get_full_repo_pr_id
+from .journal_util import STATUS_SUCCESS
+from .model import PRDataItem
+
+# relative session length per changed line, compared to the default of 1.0
+LANGUAGE_FACTORS = {
+    "C": 1.2,
+    "C++": 1.3,
+    "C#": 1.1,
+    "Java": 1.1,
+    "Rust": 1.2,
+    "Go": 1.0,
+    "Python": 0.9,
+    "JavaScript": 0.9,
+    "TypeScript": 0.9,
+    "PHP": 0.9,
+}
+
+
+# telemetry stages spent waiting on other PRs rather than working on this one
+WAIT_STAGES = ("lock_wait", "queued")
+
+
+class CostModel:
+    """
+    Estimate the seconds a PR takes from its size, language and repository.
+
+    The prior is `base_seconds + seconds_per_line * change_line_count * language factor`.
+    fit() refines it with the durations recorded by earlier runs, which are
+    PRs that already finished; what they teach is carried over to the pending
+    PRs through the features they share. The linear terms are re-fitted by
+    least squares, each language factor is re-estimated from the
+    observed/predicted ratios, and a per-repository factor (clone size, build
+    and test setup) scales the whole estimate of the repository's PRs. Both
+    factors are shrunk towards their prior when they have few observations.
+    """
+
+    def __init__(self, base_seconds: float = 120.0, seconds_per_line: float = 1.0, shrinkage: float = 5.0):
+        self.base_seconds = base_seconds
+        self.seconds_per_line = seconds_per_line
+        self.shrinkage = shrinkage
+        self.language_factors = dict(LANGUAGE_FACTORS)
+        self.repo_factors: dict[str, float] = {}
+
+    def estimate(self, item: PRDataItem) -> float:
+        factor = self.language_factors.get(item.project_main_language, 1.0)
+        repo_factor = self.repo_factors.get(_repo(item), 1.0)
+        return (self.base_seconds + self.seconds_per_line * item.change_line_count * factor) * repo_factor
+
+    def _refit_factors(self, factors: dict[str, float], key, samples: list[tuple[PRDataItem, float]]):
+        """
+        Scale each factor by the mean observed/estimated ratio of its samples,
+        weighted by their count against the shrinkage
+        """
+        ratios: dict[str, list[float]] = {}
+        for item, seconds in samples:
+            predicted = self.estimate(item)
+            if predicted > 0:
+                ratios.setdefault(key(item), []).append(seconds / predicted)
+        for name, values in ratios.items():
+            prior = factors.get(name, 1.0)
+            mean_ratio = sum(values) / len(values)
+            weight = len(values) / (len(values) + self.shrinkage)
+            factors[name] = prior * (1 - weight + weight * mean_ratio)
+
+    def fit(self, dataset: list[PRDataItem], durations: dict[str, float]):
+        """
+        Refine the model with recorded durations
+        :param dataset: PRs the durations may refer to
+        :param durations: {pr url: seconds} from earlier runs
+        """
+        samples = [(item, durations[item.githubPrUrl]) for item in dataset if durations.get(item.githubPrUrl)]
+        if len(samples) < 2:
+            return
+        xs = [item.change_line_count * LANGUAGE_FACTORS.get(item.project_main_language, 1.0) for item, _ in samples]
+        ys = [seconds for _, seconds in samples]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x > 0:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+            if slope > 0:
+                self.seconds_per_line = slope
+                self.base_seconds = max(mean_y - slope * mean_x, 0.0)
+
+        self._refit_factors(self.language_factors, lambda item: item.project_main_language, samples)
+        # fitted on what the language factors leave unexplained
+        self._refit_factors(self.repo_factors, _repo, samples)
+
+
+def _repo(item: PRDataItem) -> str:
+    return get_full_repo_pr_id(item.githubPrUrl)[0]
+
+
+def load_durations(telemetry_path: str | None = None, journal_state: dict[str, dict] | None = None) -> dict[str, float]:
+    """
+    Collect the last successful duration per PR url from a telemetry file
+    (prepare stages plus agent time) and, for PRs missing there, a replayed journal
+    """
+    durations: dict[str, float] = {}
+    for event in (journal_state or {}).values():
+        if event.get("status") == STATUS_SUCCESS and event.get("duration"):
+            durations[event["pr_url"]] = event["duration"]
+    if telemetry_path and os.path.exists(telemetry_path):
+        with open(telemetry_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("status") == STATUS_SUCCESS and record.get("agent_seconds") is not None:
+                    work = sum(seconds for stage, seconds in record.get("stages", {}).items()
+                               if stage not in WAIT_STAGES)
+                    durations[record["pr_url"]] = record["agent_seconds"] + work
+    return durations
+
+
+def order_longest_first(items: list[PRDataItem], model: CostModel) -> list[PRDataItem]:
+    """
+    Order PRs by decreasing estimated cost. Workers take PRs in this order,
+    which is the longest-processing-time-first list schedule: long PRs start
+    early and the short ones fill the gaps at the end of the run.
+    """
+    return sorted(items, key=lambda item: (-model.estimate(item), item.githubPrUrl))
+
+
+def estimate_makespan(items: list[PRDataItem], model: CostModel, workers: int) -> float:
+    """
+    Simulate workers taking PRs in the given order, return the estimated run time in seconds
+    """
+    finish_times = [0.0] * max(workers, 1)
+    for item in items:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + model.estimate(item))
+    return max(finish_times)
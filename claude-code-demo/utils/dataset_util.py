@@ -14,6 +14,16 @@ def get_gitrepo_pr_id(pr_url: str) -> tuple[str, str]:
     return repo_url, pr_id
 
 
+def get_full_repo_pr_id(pr_url: str) -> tuple[str, str]:
+    """
+    Get the owner/repo name and pr_id from the pr url
+    :param pr_url: e.g. "https://github.com/gofr-dev/gofr/pull/1681" -> ("gofr-dev/gofr", "1681")
+    """
+    repo_url, pr_id = get_gitrepo_pr_id(pr_url)
+    parts = repo_url.replace(".git", "").split("/")
+    return parts[-2] + "/" + parts[-1], pr_id
+
+
 def load_dataset(path: str) -> list[PRDataItem]:
     """
     Load the dataset from the given path
@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field, asdict
+
+from .constants_util import DIFF_APPENDIX
+from .git_util import run_git
+
+DIFF_THREE_DOT = "three-dot"
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+@dataclass
+class FileDiff:
+    """
+    Changes of one file
+    """
+    path: str
+    old_path: str
+    status: str = "modified"
+    additions: int = 0
+    deletions: int = 0
+    binary: bool = False
+    hunks: list[str] = field(default_factory=list)
+
+
+@dataclass
+class PRDiff:
+    """
+    Per-file changes between the source and target commits of a PR
+    """
+    source: str
+    target: str
+    mode: str
+    files: list[FileDiff] = field(default_factory=list)
+
+    @property
+    def additions(self) -> int:
+        return sum(f.additions for f in self.files)
+
+    @property
+    def deletions(self) -> int:
+        return sum(f.deletions for f in self.files)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PRDiff":
+        files = [FileDiff(**f) for f in data.pop("files")]
+        return cls(files=files, **data)
+
+
+def parse_patch(patch: str) -> list[FileDiff]:
+    """
+    Split a `git diff` patch into per-file hunks and line stats
+    """
+    files: list[FileDiff] = []
+    current: FileDiff | None = None
+    hunk: list[str] | None = None
+
+    def close_hunk():
+        if current is not None and hunk:
+            current.hunks.append("\n".join(hunk))
+
+    for line in patch.splitlines():
+        if line.startswith("diff --git "):
+            close_hunk()
+            hunk = None
+            match = re.match(r"diff --git a/(.*) b/(.*)$", line)
+            old_path, path = match.groups() if match else (line[11:], line[11:])
+            current = FileDiff(path=path, old_path=old_path)
+            files.append(current)
+        elif current is None:
+            continue
+        elif hunk is None:
+            # file header
+            if line.startswith("new file mode"):
+                current.status = "added"
+            elif line.startswith("deleted file mode"):
+                current.status = "deleted"
+            elif line.startswith("rename from "):
+                current.status = "renamed"
+                current.old_path = line[len("rename from "):]
+            elif line.startswith("rename to "):
+                current.path = line[len("rename to "):]
+            elif line.startswith("Binary files "):
+                current.binary = True
+            elif _HUNK_HEADER.match(line):
+                hunk = [line]
+        elif _HUNK_HEADER.match(line):
+            close_hunk()
+            hunk = [line]
+        else:
+            hunk.append(line)
+            if line.startswith("+"):
+                current.additions += 1
+            elif line.startswith("-"):
+                current.deletions += 1
+    close_hunk()
+    return files
+
+
+class DiffService:
+    """
+    Compute the diff of a PR once from its workspace and cache it on disk.
+
+    The diff is `source...target` (changes since the merge base), which the
+    prompt tells the agent to review; the workspace must hold the merge base,
+    WorkspaceManager deepens shallow mirrors until it does. Entries are keyed
+    by the two commit ids, which never change, so the cache needs no
+    invalidation.
+    """
+
+    def __init__(self, cache_dir: str | None = None):
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.cache_dir = cache_dir or os.path.join(project_root, "diffs")
+
+    def _path(self, repo: str, source: str, target: str) -> str:
+        owner, name = repo.split("/")
+        return os.path.join(self.cache_dir, f"{owner}__{name}", f"{source}_{target}")
+
+    def read(self, repo: str, source: str, target: str) -> PRDiff | None:
+        path = self._path(repo, source, target) + ".json"
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return PRDiff.from_dict(json.load(f))
+
+    def patch_path(self, repo: str, source: str, target: str) -> str:
+        """
+        Path of the cached raw patch of a PR
+        """
+        return self._path(repo, source, target) + DIFF_APPENDIX
+
+    def _write(self, repo: str, diff: PRDiff, patch: str):
+        path = self._path(repo, diff.source, diff.target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        for final_path, content in ((path + DIFF_APPENDIX, patch),
+                                    (path + ".json", json.dumps(asdict(diff), ensure_ascii=False))):
+            with open(final_path + suffix, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(final_path + suffix, final_path)
+
+    async def get(self, workspace: str, repo: str, source: str, target: str) -> PRDiff:
+        """
+        Get the diff of a PR, computing it in the workspace on a cache miss
+        :param workspace: git worktree containing both commits
+        :param repo: e.g. FreeCAD/FreeCAD
+        :param source: source commit
+        :param target: target commit
+        """
+        cached = self.read(repo, source, target)
+        if cached is not None:
+            return cached
+        patch = await run_git(['diff', '--no-color', '--no-ext-diff', '-M', f'{source}...{target}'], cwd=workspace)
+        diff = PRDiff(source=source, target=target, mode=DIFF_THREE_DOT, files=parse_patch(patch))
+        self._write(repo, diff, patch)
+        return diff
+
+
+def format_diff_summary(diff: PRDiff, max_chars: int, include_hunks: bool = True) -> str:
+    """
+    Render a size-bounded summary of a diff for the prompt: the file list with
+    line stats, then whole files' hunks in order while they fit in max_chars
+    """
+    lines = [f"{len(diff.files)} files changed, +{diff.additions} -{diff.deletions}:"]
+    for f in diff.files:
+        name = f"{f.old_path} -> {f.path}" if f.status == "renamed" else f.path
+        stats = "binary" if f.binary else f"+{f.additions} -{f.deletions}"
+        lines.append(f"- {name} ({f.status}, {stats})")
+    text = "\n".join(lines)
+    if not include_hunks or len(text) >= max_chars:
+        return text[:max_chars]
+
+    sections = []
+    budget = max_chars - len(text)
+    omitted = []
+    for f in diff.files:
+        if not f.hunks:
+            continue
+        section = f"\n--- {f.path}\n" + "\n".join(f.hunks)
+        if len(section) > budget:
+            omitted.append(f.path)
+            continue
+        sections.append(section)
+        budget -= len(section)
+    text += "\n" + "".join(sections)
+    if omitted:
+        text += f"\n(hunks of {len(omitted)} files omitted for size, see the full patch)"
+    return text
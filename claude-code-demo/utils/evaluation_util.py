@@ -0,0 +1,200 @@
+import json
+import math
+import os
+import sys
+import traceback
+
+import anyio
+from anyio.abc import ObjectReceiveStream, ObjectSendStream
+
+# evaluator_runner lives next to claude-code-demo in the repository root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from evaluator_runner import (  # noqa: E402
+    EvaluatorConfig,
+    Scoreboard,
+    SemanticMatcherType,
+    get_evaluator_ans_from_json,
+    load_generated_comments_from_file,
+)
+
+
+def _load_references(path: str | None) -> dict[str, dict] | None:
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return {item["githubPrUrl"]: item for item in json.load(f)}
+
+
+class StreamingEvaluator:
+    """
+    Evaluate each PR as soon as its agent session finishes.
+
+    Comments are handed over with the PR url they were generated for, so no
+    filename matching is needed. A pool of evaluation workers runs the
+    semantic judging concurrently with the next agent sessions and keeps a
+    running scoreboard; results are appended to a JSONL file as they arrive
+    and the summary is written when the evaluator is closed.
+
+    The JSONL file of the previous run doubles as a cache: PRs finished by
+    earlier runs are passed to resume(), which reuses their result instead of
+    paying for the semantic matching again when it was computed with the
+    same settings.
+
+    Use as an async context manager: submit() PRs inside the block, leaving
+    the block waits for the pending evaluations.
+    """
+
+    def __init__(self, reference_path: str, negative_path: str | None = None,
+                 config: EvaluatorConfig | None = None, workers: int = 4,
+                 output_path: str = "results/evaluation_results.json"):
+        self.references = _load_references(reference_path)
+        self.negatives = _load_references(negative_path)
+        self.config = config or EvaluatorConfig()
+        self.workers = workers
+        self.output_path = output_path
+        self.details_path = os.path.splitext(output_path)[0] + ".jsonl"
+        self.scoreboard = Scoreboard()
+        self.reused = 0
+        self._cached: dict[str, dict] = {}
+        self._send: ObjectSendStream | None = None
+        self._tg = None
+
+    async def __aenter__(self) -> "StreamingEvaluator":
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        self._cached = self._load_cached()
+        # details of this run only, the summary covers the same PRs
+        open(self.details_path, "w").close()
+        self._send, receive = anyio.create_memory_object_stream[tuple[str, str | None]](math.inf)
+        self._tg = anyio.create_task_group()
+        await self._tg.__aenter__()
+        async with receive:
+            for _ in range(self.workers):
+                self._tg.start_soon(self._worker, receive.clone())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._send.close()
+        try:
+            return await self._tg.__aexit__(exc_type, exc, tb)
+        finally:
+            self._write_summary()
+
+    def _load_cached(self) -> dict[str, dict]:
+        """
+        Results of the previous run computed with the current settings, by PR url
+        """
+        if not os.path.exists(self.details_path):
+            return {}
+        settings = {
+            "line_distance_threshold": self.config.line_distance_threshold,
+            "semantic_matcher_type": self.config.semantic_matcher_type.value,
+            "enable_semantic_match": self.config.enable_semantic_match
+        }
+        cached = {}
+        with open(self.details_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # cut short by an interrupted run
+                    continue
+                if result.get("config") == settings and \
+                        ("negative_expected_nums" in result) == (self.negatives is not None):
+                    cached[result["github_pr_url"]] = result
+        return cached
+
+    async def resume(self, pr_url: str, comments_path: str | None):
+        """
+        Queue a PR finished by an earlier run, reusing its result from the
+        previous run if there is one
+        """
+        result = self._cached.pop(pr_url, None)
+        if result is None:
+            await self.submit(pr_url, comments_path)
+            return
+        self.reused += 1
+        self._record(result)
+
+    async def submit(self, pr_url: str, comments_path: str | None):
+        """
+        Queue a PR for evaluation, never blocks the caller
+        :param pr_url: GitHub pr url the comments were generated for
+        :param comments_path: comments file written by the agent, None if it wrote none
+        """
+        self._send.send_nowait((pr_url, comments_path))
+
+    async def evaluate(self, pr_url: str, comments_path: str | None) -> dict | None:
+        """
+        Evaluate the comments of one PR
+        :return: evaluation result, None if the PR cannot be evaluated
+        """
+        ref_item = self.references.get(pr_url)
+        if ref_item is None:
+            print(f"evaluate {pr_url}: no reference data, skipped")
+            return None
+        if not comments_path or not os.path.exists(comments_path):
+            print(f"evaluate {pr_url}: no comments, skipped")
+            return None
+        generated_comments = load_generated_comments_from_file(comments_path)
+        if not generated_comments:
+            print(f"evaluate {pr_url}: no valid comments, skipped")
+            return None
+        negative_comments = None
+        if self.negatives is not None:
+            negative_item = self.negatives.get(pr_url)
+            negative_comments = negative_item.get("comments", []) if negative_item else []
+        return await get_evaluator_ans_from_json(
+            github_pr_url=pr_url,
+            generated_comments=generated_comments,
+            good_comments=ref_item.get("comments", []),
+            config=self.config,
+            pr_metadata={
+                "category": ref_item.get("category"),
+                "project_main_language": ref_item.get("project_main_language"),
+            },
+            bad_comments=negative_comments,
+        )
+
+    async def _worker(self, receive: ObjectReceiveStream):
+        async with receive:
+            async for pr_url, comments_path in receive:
+                try:
+                    result = await self.evaluate(pr_url, comments_path)
+                except Exception:
+                    print(f"evaluate {pr_url} failed")
+                    traceback.print_exc()
+                    result = None
+                self._record(result)
+                print(f"scoreboard {self.scoreboard.format_line()}")
+
+    def _record(self, result: dict | None):
+        self.scoreboard.add(result)
+        if result is not None:
+            with open(self.details_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def _write_summary(self):
+        tmp_path = self.output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.scoreboard.summary(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.output_path)
+
+
+def build_evaluator(config: dict) -> StreamingEvaluator:
+    """
+    Build a StreamingEvaluator from the "evaluation" section of config.json
+    """
+    evaluation = config.get("evaluation", {})
+    evaluator_config = EvaluatorConfig(
+        line_distance_threshold=evaluation.get("line_distance_threshold", 1),
+        semantic_matcher_type=SemanticMatcherType(evaluation.get("semantic_matcher_type", "llm")),
+        enable_semantic_match=evaluation.get("enable_semantic_match", True),
+    )
+    return StreamingEvaluator(
+        reference_path=evaluation.get("reference_data", "../dataset/positive_samples.json"),
+        negative_path=evaluation.get("negative_data"),
+        config=evaluator_config,
+        workers=evaluation.get("workers", 4),
+        output_path=evaluation.get("output_path", "results/evaluation_results.json")
+    )
@@ -1,139 +1,58 @@
-import subprocess
-from pathlib import Path
+import asyncio
 import os
-import requests
 
 
-def _get_workspace_and_origin(workspace: str):
+class GitCommandError(RuntimeError):
     """
-    Get the workspace path and original directory
+    A git command exited with a non-zero status
     """
-    workspace_path = Path(workspace)
-    if not workspace_path.exists():
-        raise ValueError(f"Workspace directory does not exist: {workspace}")
 
-    if not workspace_path.is_dir():
-        raise ValueError(f"Workspace path is not a directory: {workspace}")
+    def __init__(self, args: list[str], cwd: str | None, returncode: int, stderr: str):
+        self.git_args = args
+        self.cwd = cwd
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__(f"git {' '.join(args)} failed in '{cwd}' (exit {returncode})\nError: {stderr}")
 
-    # Check if it's a git repository
-    git_dir = os.path.join(workspace, '.git')
-    if not os.path.exists(git_dir):
-        raise ValueError(f"Not a git repository: {workspace}")
 
-    # Change to the workspace directory
-    original_dir = os.getcwd()
-    return workspace_path, original_dir
+_repo_locks: dict[str, asyncio.Lock] = {}
 
-def git_clone(git_repo_url: str):
-    """
-    Clone a git repository to the specified directory
-    """
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-
-    # Create the absolute path for the repo directory
-    repo_dir = "repos"
-    abs_repo_dir = os.path.join(project_root, repo_dir)
-    os.makedirs(abs_repo_dir, exist_ok=True)
 
-    # Extract repo name from URL for the target directory
-    repo_name = git_repo_url.rstrip('/').split('/')[-1].replace('.git', '')
-    target_dir = os.path.join(abs_repo_dir, repo_name)
-
-    # Clone the repository, if target dir exists, return
-    if os.path.exists(target_dir):
-        return target_dir
-    try:
-        result = subprocess.run(
-            ['git', 'clone', git_repo_url, str(target_dir)],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        print(result.stderr)
-    except Exception as e:
-        raise ValueError(e)
-
-    return str(target_dir)
-
-
-def checkout(workspace: str, pull_pr: str, branch: str):
+def repo_lock(repo_key: str) -> asyncio.Lock:
     """
-    Fetch pr status from GitHub and check out to specific branch
-    :param workspace: workspace path
-    :param pull_pr: e.g. pull/1234
-    :param branch: branch name
+    Get the lock serializing git operations on one repository
+    :param repo_key: path of the repository (or its mirror)
     """
-    # Validate workspace directory exists
-    workspace_path, original_dir = _get_workspace_and_origin(workspace)
-    try:
-        os.chdir(workspace_path)
+    key = os.path.abspath(repo_key)
+    if key not in _repo_locks:
+        _repo_locks[key] = asyncio.Lock()
+    return _repo_locks[key]
 
-        # Fetch all branches first to ensure the branch is available
-        fetch_pr = pull_pr + "/head:" + branch
-        try:
-            subprocess.run(
-                ['git', 'fetch', 'origin', fetch_pr],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-        except Exception:
-            # already fetched
-            pass
 
-        # Checkout to the specified branch
-        subprocess.run(
-            ['git', 'checkout', branch],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to checkout branch '{branch}' in workspace '{workspace}'\n"
-        error_msg += f"Error: {e.stderr}\n"
-        error_msg += f"Please verify that the branch exists and you have access to it."
-        raise RuntimeError(error_msg) from e
-    finally:
-        # Restore the original working directory
-        os.chdir(original_dir)
-
-
-def git_fetch(workspace: str, remote: str, commit_id: str):
+async def run_git(args: list[str], cwd: str | None = None, env: dict[str, str] | None = None) -> str:
     """
-    Fetch a commit from a remote, mainly used for hidden commit
-    :param workspace: workspace path
-    :param remote: e.g. origin/main
-    :param commit_id: commit id
-    :return:
+    Run a git command in the given directory without changing the process cwd.
+    The git process is killed if the calling task is cancelled.
+    :param args: git arguments, e.g. ['fetch', 'origin', 'main']
+    :param cwd: directory to run in
+    :param env: extra environment variables for the git process
+    :return: stdout of the command
     """
-    workspace_path, original_dir = _get_workspace_and_origin(workspace)
+    process = await asyncio.create_subprocess_exec(
+        'git', *args,
+        cwd=cwd,
+        env={**os.environ, **env} if env else None,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
     try:
-        os.chdir(workspace_path)
-        # Fetch the commit
-        subprocess.run(
-            ['git', 'fetch', remote, commit_id],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to fetch commit '{commit_id}' from remote '{remote}' in workspace '{workspace}'\n"
-        error_msg += f"Error: {e.stderr}\n"
-        error_msg += f"Please verify that the commit exists and you have access to it."
-        raise RuntimeError(error_msg) from e
-    finally:
-        # Restore the original working directory
-        os.chdir(original_dir)
-
-
-def get_pr_title_desc(repo: str, pr_id: str):
-    """
-    Get the PR title and description
-    """
-    url = f"https://api.github.com/repos/{repo}/pulls/{pr_id}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise ValueError(f"Failed to get PR {pr_id} from {repo}")
-    return response.json()["title"], response.json()["body"]
-
+        stdout, stderr = await process.communicate()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        raise GitCommandError(args, cwd, process.returncode, stderr.decode(errors="replace"))
+    return stdout.decode(errors="replace")
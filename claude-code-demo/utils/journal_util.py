@@ -0,0 +1,126 @@
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+
+
+class ProgressJournal:
+    """
+    Append-only JSONL journal of PR completion events.
+
+    Each event is written with a single O_APPEND write, so several worker
+    processes can share one journal. replay() folds the events into the latest
+    state per PR; compact() rewrites the file with only those latest events.
+    """
+
+    def __init__(self, path: str, compact_ratio: float = 2.0):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self._lines = 0
+        self._torn = False
+
+    def _lock(self, f, exclusive: bool):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def record(self, pr_url: str, status: str, duration: float | None = None,
+               output_path: str | None = None, **extra):
+        """
+        Append one completion event
+        :param pr_url: GitHub pr url
+        :param status: success or failed
+        :param duration: seconds spent on the PR
+        :param output_path: written comments file, if any
+        """
+        event = {"pr_url": pr_url, "status": status, "duration": duration,
+                 "output_path": output_path, "time": time.time(), **extra}
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+                    # a concurrent compact() may have replaced the file meanwhile
+                    if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                        continue
+                os.write(fd, line)
+                break
+            finally:
+                os.close(fd)
+        self._lines += 1
+
+    def replay(self) -> dict[str, dict]:
+        """
+        Fold the journal into the latest event per PR url
+        """
+        state: dict[str, dict] = {}
+        self._lines = 0
+        self._torn = False
+        if not os.path.exists(self.path):
+            return state
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn tail of an interrupted write, dropped by the next compact()
+                    self._torn = True
+                    continue
+                state[event["pr_url"]] = event
+        return state
+
+    def finished(self) -> set[str]:
+        """
+        PR urls whose latest event is a success
+        """
+        return {url for url, event in self.replay().items() if event["status"] == STATUS_SUCCESS}
+
+    def compact(self, force: bool = False) -> bool:
+        """
+        Rewrite the journal keeping only the latest event per PR, when it has
+        grown past compact_ratio times the number of PRs or has a torn line
+        :return: whether the journal was rewritten
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r+", encoding="utf-8") as f:
+            self._lock(f, exclusive=True)
+            state = self.replay()
+            if not force and not self._torn and self._lines <= max(len(state), 1) * self.compact_ratio:
+                return False
+            self._rewrite(state)
+        return True
+
+    def _rewrite(self, state: dict[str, dict]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as tmp:
+            for event in state.values():
+                tmp.write(json.dumps(event, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(state)
+
+    def merge(self, paths: list[str]) -> int:
+        """
+        Fold other journals, e.g. those of the shards of a sharded run, into
+        this one, keeping the most recent event per PR
+        :return: number of PRs in the merged journal
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a+", encoding="utf-8") as f:
+            self._lock(f, exclusive=True)
+            state = self.replay()
+            for path in paths:
+                for url, event in ProgressJournal(path).replay().items():
+                    if url not in state or event["time"] >= state[url]["time"]:
+                        state[url] = event
+            self._rewrite(state)
+        return len(state)
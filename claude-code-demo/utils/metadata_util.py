@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .constants_util import HTTP_OK
+
+HTTP_NOT_MODIFIED = 304
+GITHUB_API = "https://api.github.com"
+
+
+class PRMetadataStore:
+    """
+    On-disk cache of PR title and body keyed by repo and PR number.
+
+    Entries are filled by prefetch() through one pooled HTTP session and
+    revalidated with ETag/If-None-Match, so unchanged PRs cost a 304 that
+    does not count against the GitHub rate limit. In offline mode reads are
+    served from the cache only.
+    """
+
+    def __init__(self, cache_dir: str | None = None, token: str | None = None, offline: bool = False,
+                 pool_size: int = 8, max_rate_limit_wait: float = 3600):
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.cache_dir = cache_dir or os.path.join(project_root, "pr_metadata")
+        self.offline = offline
+        self.pool_size = pool_size
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self._token = token or os.getenv("GITHUB_TOKEN")
+        self._session: requests.Session | None = None
+        self._session_lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.headers["Accept"] = "application/vnd.github+json"
+                if self._token:
+                    session.headers["Authorization"] = f"Bearer {self._token}"
+                self._session = session
+            return self._session
+
+    def _path(self, repo: str, pr_id: str) -> str:
+        owner, name = repo.split("/")
+        return os.path.join(self.cache_dir, f"{owner}__{name}", f"{pr_id}.json")
+
+    def read(self, repo: str, pr_id: str) -> dict | None:
+        """
+        Read a cached entry
+        :param repo: e.g. FreeCAD/FreeCAD
+        :param pr_id: PR number
+        :return: {"title", "body", "etag", "fetched_at"} or None
+        """
+        path = self._path(repo, pr_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, repo: str, pr_id: str, entry: dict):
+        path = self._path(repo, pr_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _rate_limit_wait(self, response: requests.Response) -> float | None:
+        """
+        Seconds to wait before retrying a rate limited response, None if not rate limited
+        """
+        if response.status_code not in (403, 429):
+            return None
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+            return max(reset - time.time(), 0) + 1
+        return None
+
+    def fetch(self, repo: str, pr_id: str) -> dict:
+        """
+        Fetch (or revalidate) a PR from the GitHub API and update the cache
+        :return: the cache entry
+        """
+        cached = self.read(repo, pr_id)
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        url = f"{GITHUB_API}/repos/{repo}/pulls/{pr_id}"
+        session = self._get_session()
+        while True:
+            response = session.get(url, headers=headers, timeout=30)
+            wait = self._rate_limit_wait(response)
+            if wait is None:
+                break
+            if wait > self.max_rate_limit_wait:
+                raise ValueError(f"GitHub rate limit exceeded, reset in {wait:.0f}s")
+            print(f"GitHub rate limit reached, waiting {wait:.0f}s")
+            time.sleep(wait)
+
+        if response.status_code == HTTP_NOT_MODIFIED and cached:
+            return cached
+        if response.status_code != HTTP_OK:
+            raise ValueError(f"Failed to get PR {pr_id} from {repo}: HTTP {response.status_code}")
+        data = response.json()
+        entry = {
+            "title": data["title"],
+            "body": data["body"],
+            "etag": response.headers.get("ETag"),
+            "fetched_at": time.time()
+        }
+        self._write(repo, pr_id, entry)
+        return entry
+
+    def get_title_desc(self, repo: str, pr_id: str) -> tuple[str, str]:
+        """
+        Get the PR title and description, from the cache when possible
+        """
+        entry = self.read(repo, pr_id)
+        if entry is None:
+            if self.offline:
+                raise ValueError(f"PR {pr_id} of {repo} is not in the metadata cache, run prefetch first")
+            entry = self.fetch(repo, pr_id)
+        return entry["title"], entry["body"]
+
+    def prefetch(self, repo_prs: list[tuple[str, str]], revalidate: bool = True) -> dict[str, list[str]]:
+        """
+        Fill the cache for many PRs concurrently through the pooled session
+        :param repo_prs: [(repo, pr_id), ...]
+        :param revalidate: also revalidate entries that are already cached
+        :return: {"fetched": [...], "failed": [...]}
+        """
+        if self.offline:
+            raise ValueError("Cannot prefetch PR metadata in offline mode")
+        todo = [(repo, pr_id) for repo, pr_id in repo_prs
+                if revalidate or self.read(repo, pr_id) is None]
+        report = {"fetched": [], "failed": []}
+
+        def fetch_one(repo_pr: tuple[str, str]):
+            repo, pr_id = repo_pr
+            try:
+                self.fetch(repo, pr_id)
+                report["fetched"].append(f"{repo}#{pr_id}")
+            except Exception as e:
+                print(f"prefetch {repo}#{pr_id} failed: {e}")
+                report["failed"].append(f"{repo}#{pr_id}")
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            list(executor.map(fetch_one, todo))
+        return report
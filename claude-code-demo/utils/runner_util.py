@@ -0,0 +1,144 @@
+import math
+import traceback
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import anyio
+from anyio.abc import ObjectReceiveStream, ObjectSendStream, TaskGroup
+
+from .model import PRDataItem
+from .scheduler_util import AdaptiveRateLimiter, AdmissionController, BackendError, RateLimitedError
+
+
+async def run_pipeline(
+        items: Iterable[PRDataItem],
+        prepare: Callable[[PRDataItem], Awaitable[Any]],
+        review: Callable[[PRDataItem, Any], Awaitable[None]],
+        workers: int,
+        prefetch: int = 1,
+        prepare_workers: int = 1,
+        max_retries: int = 0,
+        retry_delay: float = 0.0,
+        prepare_timeout: Optional[float] = None,
+        review_timeout: Optional[float] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        admission: Optional[AdmissionController] = None,
+        on_finish: Optional[Callable[[PRDataItem, bool, Optional[str]], Awaitable[None]]] = None,
+) -> dict[str, list[str]]:
+    """
+    Process PRs in two stages: prepare workers get workspaces and metadata
+    ready for the next PRs while review workers run agent sessions.
+
+    At most `prefetch` PRs are prepared (or being prepared) ahead of the review
+    workers; a prepare worker waits for a free slot before starting the next
+    PR, which bounds disk usage and keeps git from running far ahead.
+    A PR that fails in either stage goes back to the prepare queue until it
+    has used max_retries extra attempts. Each stage runs under its own deadline,
+    so a stuck git command or agent session is cancelled and retried instead of
+    holding its worker forever.
+    :param items: PRs to process, taken in order
+    :param prepare: coroutine preparing one PR, returns a context for review
+    :param review: coroutine reviewing one prepared PR, owns the context cleanup
+    :param workers: number of concurrent review (agent) workers
+    :param prefetch: number of prepared PRs allowed to wait for a review worker
+    :param prepare_workers: number of concurrent prepare workers
+    :param max_retries: extra attempts for a failed PR
+    :param retry_delay: seconds to wait before re-queueing a failed PR
+    :param prepare_timeout: seconds allowed for one prepare call, None for no limit
+    :param review_timeout: seconds allowed for one review call, None for no limit
+    :param rate_limiter: decides when each agent session may start, fed with session outcomes;
+        only BackendError failures make it back off
+    :param admission: admits each agent session while the host has headroom, workers should be
+        at least its ceiling
+    :param on_finish: callback(item, success, error) invoked once per PR
+    :return: {"succeeded": [...pr urls], "failed": [...pr urls], "errors": {pr url: last error}}
+    """
+    if workers < 1 or prefetch < 1 or prepare_workers < 1:
+        raise ValueError("workers, prefetch and prepare_workers must be >= 1")
+    items = list(items)
+    report = {"succeeded": [], "failed": [], "errors": {}}
+    if not items:
+        return report
+
+    todo_send, todo_recv = anyio.create_memory_object_stream[tuple[PRDataItem, int]](math.inf)
+    ready_send, ready_recv = anyio.create_memory_object_stream[tuple[PRDataItem, int, Any]](math.inf)
+    slots = anyio.Semaphore(prefetch)
+    remaining = len(items)
+
+    for item in items:
+        todo_send.send_nowait((item, 0))
+
+    async def finish(item: PRDataItem, error: Optional[str]):
+        nonlocal remaining
+        report["failed" if error else "succeeded"].append(item.githubPrUrl)
+        if error:
+            report["errors"][item.githubPrUrl] = error
+        if on_finish is not None:
+            await on_finish(item, error is None, error)
+        remaining -= 1
+        if remaining == 0:
+            todo_send.close()
+
+    async def requeue(item: PRDataItem, attempt: int):
+        await anyio.sleep(retry_delay)
+        await todo_send.send((item, attempt + 1))
+
+    async def fail(tg: TaskGroup, item: PRDataItem, attempt: int, stage: str, e: Exception):
+        if isinstance(e, TimeoutError):
+            timeout = prepare_timeout if stage == "prepare" else review_timeout
+            error = f"{stage}: timed out after {timeout}s"
+        else:
+            error = f"{stage}: {type(e).__name__}: {e}"
+        print(f"[attempt {attempt + 1}/{max_retries + 1}] {item.githubPrUrl} failed in {error}")
+        if not isinstance(e, TimeoutError):
+            traceback.print_exc()
+        if attempt < max_retries:
+            tg.start_soon(requeue, item, attempt)
+        else:
+            await finish(item, error)
+
+    async def prepare_worker(tg: TaskGroup, todo: ObjectReceiveStream,
+                             ready: ObjectSendStream):
+        async with todo, ready:
+            async for item, attempt in todo:
+                await slots.acquire()
+                try:
+                    with anyio.fail_after(prepare_timeout):
+                        context = await prepare(item)
+                except Exception as e:
+                    slots.release()
+                    await fail(tg, item, attempt, "prepare", e)
+                    continue
+                await ready.send((item, attempt, context))
+
+    async def review_worker(tg: TaskGroup, ready: ObjectReceiveStream):
+        async with ready:
+            async for item, attempt, context in ready:
+                slots.release()
+                if admission is not None:
+                    await admission.acquire()
+                try:
+                    if rate_limiter is not None:
+                        await rate_limiter.acquire()
+                    try:
+                        with anyio.fail_after(review_timeout):
+                            await review(item, context)
+                    except Exception as e:
+                        # timeouts and failures of this PR leave the backoff alone
+                        if rate_limiter is not None and isinstance(e, BackendError):
+                            rate_limiter.record_failure(rate_limited=isinstance(e, RateLimitedError))
+                        await fail(tg, item, attempt, "review", e)
+                    else:
+                        if rate_limiter is not None:
+                            rate_limiter.record_success()
+                        await finish(item, None)
+                finally:
+                    if admission is not None:
+                        admission.release()
+
+    async with anyio.create_task_group() as tg:
+        async with todo_recv, ready_send, ready_recv:
+            for _ in range(prepare_workers):
+                tg.start_soon(prepare_worker, tg, todo_recv.clone(), ready_send.clone())
+            for _ in range(workers):
+                tg.start_soon(review_worker, tg, ready_recv.clone())
+    return report
@@ -0,0 +1,253 @@
+import math
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import anyio
+
+
+class BackendError(RuntimeError):
+    """
+    The agent backend or the transport to it failed during a session
+    """
+
+
+class RateLimitedError(BackendError):
+    """
+    The agent backend reported a rate limit during a session
+    """
+
+
+class AdaptiveRateLimiter:
+    """
+    Decide when the next agent session may start.
+
+    Sessions start immediately while the backend is healthy, limited only by
+    an optional budget of `max_sessions` launches per `window` seconds.
+    After a backend failure every launch waits an exponentially growing
+    backoff (rate-limit signals grow it twice as fast); successes shrink it
+    again. Failures of a single PR, such as its timeout, are not reported
+    here, they say nothing about the backend.
+    """
+
+    def __init__(self, max_sessions: int | None = None, window: float = 60.0,
+                 backoff_base: float = 30.0, backoff_max: float = 900.0, jitter: float = 0.1):
+        self.max_sessions = max_sessions
+        self.window = window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self._launches: deque[float] = deque()
+        self._failures = 0
+        self._not_before = 0.0
+        self._lock = anyio.Lock()
+        self.stats = {"launched": 0, "succeeded": 0, "failed": 0, "rate_limited": 0, "waited_seconds": 0.0}
+
+    def _backoff(self) -> float:
+        if self._failures == 0:
+            return 0.0
+        delay = min(self.backoff_base * 2 ** (self._failures - 1), self.backoff_max)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def acquire(self):
+        """
+        Wait until a new session may be launched
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._launches and now - self._launches[0] >= self.window:
+                    self._launches.popleft()
+                wait = self._not_before - now
+                if self.max_sessions and len(self._launches) >= self.max_sessions:
+                    wait = max(wait, self._launches[0] + self.window - now)
+                if wait <= 0:
+                    break
+                self.stats["waited_seconds"] += wait
+                await anyio.sleep(wait)
+            self._launches.append(time.monotonic())
+            self.stats["launched"] += 1
+
+    def record_success(self):
+        self.stats["succeeded"] += 1
+        self._failures = max(self._failures - 1, 0)
+        if self._failures == 0:
+            self._not_before = 0.0
+
+    def record_failure(self, rate_limited: bool = False, retry_after: float | None = None):
+        """
+        Back off after a session failed in the backend
+        :param rate_limited: the backend signalled a rate limit
+        :param retry_after: explicit delay requested by the backend, in seconds
+        """
+        self.stats["failed"] += 1
+        self._failures += 2 if rate_limited else 1
+        if rate_limited:
+            self.stats["rate_limited"] += 1
+        delay = retry_after if retry_after is not None else self._backoff()
+        self._not_before = max(self._not_before, time.monotonic() + delay)
+        print(f"backing off {delay:.0f}s after {'rate limit' if rate_limited else 'failure'}")
+
+
+@dataclass
+class HostSnapshot:
+    """
+    Host load as read from /proc, None where the value is not available
+    """
+    load_per_cpu: float | None = None
+    available_memory_mb: float | None = None
+    total_memory_mb: float | None = None
+    # "some avg10" of /proc/pressure/{cpu,memory,io}, percent of time stalled
+    pressure: dict[str, float] = field(default_factory=dict)
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def sample_host() -> HostSnapshot:
+    """
+    Read load average, available memory and PSI pressure of the host
+    """
+    snapshot = HostSnapshot()
+    loadavg = _read("/proc/loadavg")
+    if loadavg:
+        snapshot.load_per_cpu = float(loadavg.split()[0]) / (os.cpu_count() or 1)
+    meminfo = _read("/proc/meminfo")
+    if meminfo:
+        values = {}
+        for line in meminfo.splitlines():
+            key, _, rest = line.partition(":")
+            if rest.split():
+                values[key] = int(rest.split()[0])
+        if "MemAvailable" in values:
+            snapshot.available_memory_mb = values["MemAvailable"] / 1024
+        if "MemTotal" in values:
+            snapshot.total_memory_mb = values["MemTotal"] / 1024
+    for resource in ("cpu", "memory", "io"):
+        pressure = _read(f"/proc/pressure/{resource}")
+        for line in (pressure or "").splitlines():
+            if line.startswith("some "):
+                fields = dict(part.split("=") for part in line.split()[1:])
+                snapshot.pressure[resource] = float(fields["avg10"])
+    return snapshot
+
+
+class AdmissionController:
+    """
+    Admit agent sessions while the host has headroom.
+
+    Up to `min_sessions` sessions are always admitted. Beyond that a session
+    is admitted only while the 1-minute load average per CPU, the available
+    memory (keeping `memory_per_session_mb` for the new session) and the
+    10-second PSI pressure of cpu, memory and io are all within their limits,
+    and never more than `max_sessions` at once. After each admission above
+    the floor the controller waits `ramp_seconds` so the new session shows in
+    the host metrics before the next decision. Values /proc does not provide
+    (non-Linux hosts, kernels without PSI) do not block admission.
+
+    Without `max_sessions` the ceiling is derived from the host: one session
+    per CPU, and no more than fit in memory at `memory_per_session_mb` each,
+    so the same configuration scales with the runner size.
+    """
+
+    def __init__(self, min_sessions: int = 1, max_sessions: int | None = None, max_load_per_cpu: float = 1.0,
+                 min_available_memory_mb: float = 2048, memory_per_session_mb: float = 1024,
+                 max_pressure: float = 25.0, ramp_seconds: float = 15.0, poll_seconds: float = 5.0,
+                 sampler=sample_host):
+        self.min_sessions = max(min_sessions, 1)
+        self.max_load_per_cpu = max_load_per_cpu
+        self.min_available_memory_mb = min_available_memory_mb
+        self.memory_per_session_mb = memory_per_session_mb
+        self.max_pressure = max_pressure
+        self.ramp_seconds = ramp_seconds
+        self.poll_seconds = poll_seconds
+        self.sampler = sampler
+        if max_sessions is None:
+            max_sessions = os.cpu_count() or 1
+            total_memory = sampler().total_memory_mb
+            if total_memory and memory_per_session_mb:
+                max_sessions = min(max_sessions, int(total_memory // memory_per_session_mb))
+        self.max_sessions = max(max_sessions, self.min_sessions)
+        self.running = 0
+        self._last_admitted = -math.inf
+        self._released = anyio.Event()
+        self._lock = anyio.Lock()
+        self.stats = {"admitted": 0, "peak_sessions": 0, "waited_seconds": 0.0, "blocked": {}}
+
+    def blocked_by(self, snapshot: HostSnapshot) -> str | None:
+        """
+        Name of the first exhausted resource, None if a session fits
+        """
+        if snapshot.load_per_cpu is not None and snapshot.load_per_cpu > self.max_load_per_cpu:
+            return "load"
+        if (snapshot.available_memory_mb is not None
+                and snapshot.available_memory_mb - self.memory_per_session_mb < self.min_available_memory_mb):
+            return "memory"
+        for resource, pressure in snapshot.pressure.items():
+            if pressure > self.max_pressure:
+                return f"{resource} pressure"
+        return None
+
+    async def _wait(self, seconds: float):
+        # woken early when a session is released
+        released = self._released
+        with anyio.move_on_after(seconds):
+            await released.wait()
+
+    async def acquire(self):
+        """
+        Wait until a new session may be started
+        """
+        async with self._lock:
+            start = time.monotonic()
+            blocked = None
+            while self.running >= self.min_sessions:
+                if self.running < self.max_sessions:
+                    ramp = self._last_admitted + self.ramp_seconds - time.monotonic()
+                    if ramp > 0:
+                        await self._wait(ramp)
+                        continue
+                    reason = self.blocked_by(self.sampler())
+                    if reason is None:
+                        break
+                    if reason != blocked:
+                        print(f"admission: holding session {self.running + 1}, {reason} over limit")
+                        self.stats["blocked"][reason] = self.stats["blocked"].get(reason, 0) + 1
+                    blocked = reason
+                await self._wait(self.poll_seconds)
+            self.stats["waited_seconds"] += time.monotonic() - start
+            self.running += 1
+            self._last_admitted = time.monotonic()
+            self.stats["admitted"] += 1
+            self.stats["peak_sessions"] = max(self.stats["peak_sessions"], self.running)
+
+    def release(self):
+        """
+        Record that an admitted session has ended
+        """
+        self.running -= 1
+        self._released.set()
+        self._released = anyio.Event()
+
+
+def build_admission(config: dict) -> AdmissionController:
+    """
+    Build an AdmissionController from the "admission" section of config.json
+    """
+    return AdmissionController(
+        min_sessions=config.get("min_sessions", 1),
+        max_sessions=config.get("max_sessions"),
+        max_load_per_cpu=config.get("max_load_per_cpu", 1.0),
+        min_available_memory_mb=config.get("min_available_memory_mb", 2048),
+        memory_per_session_mb=config.get("memory_per_session_mb", 1024),
+        max_pressure=config.get("max_pressure", 25.0),
+        ramp_seconds=config.get("ramp_seconds", 15),
+        poll_seconds=config.get("poll_seconds", 5)
+    )
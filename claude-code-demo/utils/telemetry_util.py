@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+from .journal_util import STATUS_SUCCESS
+
+
+@dataclass
+class PRTelemetry:
+    """
+    Timings and agent figures of one attempt at one PR
+    """
+    pr_url: str
+    attempt: int = 1
+    status: str = ""
+    stages: dict[str, float] = field(default_factory=dict)
+    agent_seconds: float | None = None
+    num_turns: int | None = None
+    duration_ms: int | None = None
+    duration_api_ms: int | None = None
+    total_cost_usd: float | None = None
+    usage: dict = field(default_factory=dict)
+    comment_count: int | None = None
+    error: str | None = None
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = round(self.stages.get(name, 0.0) + seconds, 3)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block as the given stage
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.monotonic() - start)
+
+    def record_result(self, message):
+        """
+        Copy the figures reported by a claude_agent_sdk ResultMessage
+        """
+        self.num_turns = message.num_turns
+        self.duration_ms = message.duration_ms
+        self.duration_api_ms = message.duration_api_ms
+        self.total_cost_usd = message.total_cost_usd
+        self.usage = dict(message.usage or {})
+
+
+def count_comments(comments_path: str | None) -> int:
+    """
+    Count the <note> blocks of a comments file
+    """
+    if not comments_path or not os.path.exists(comments_path):
+        return 0
+    with open(comments_path, "r", encoding="utf-8") as f:
+        return len(re.findall(r"<note>", f.read()))
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class TelemetryRecorder:
+    """
+    Append per-PR telemetry records to a JSONL metrics file and summarize the run
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: list[PRTelemetry] = []
+        self._started = time.monotonic()
+
+    def start(self, pr_url: str, attempt: int = 1) -> PRTelemetry:
+        return PRTelemetry(pr_url=pr_url, attempt=attempt)
+
+    def finish(self, record: PRTelemetry, status: str, error: str | None = None):
+        """
+        Store a finished attempt
+        """
+        record.status = status
+        record.error = error
+        self.records.append(record)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), **asdict(record)}, ensure_ascii=False) + "\n")
+
+    def summary(self) -> dict:
+        """
+        Run-level summary of the recorded attempts
+        """
+        agent_seconds = [r.agent_seconds for r in self.records if r.agent_seconds is not None]
+        stage_totals: dict[str, float] = {}
+        for r in self.records:
+            for name, seconds in r.stages.items():
+                stage_totals[name] = round(stage_totals.get(name, 0.0) + seconds, 3)
+        tokens: dict[str, int] = {}
+        for r in self.records:
+            for key, value in r.usage.items():
+                if isinstance(value, (int, float)) and key.endswith("tokens"):
+                    tokens[key] = tokens.get(key, 0) + value
+        per_repo: dict[str, float] = {}
+        for r in self.records:
+            repo = "/".join(r.pr_url.split("/")[3:5])
+            per_repo[repo] = per_repo.get(repo, 0.0) + sum(r.stages.values()) + (r.agent_seconds or 0.0)
+        return {
+            "wall_seconds": round(time.monotonic() - self._started, 1),
+            "attempts": len(self.records),
+            "succeeded": sum(1 for r in self.records if r.status == STATUS_SUCCESS),
+            "failed": sum(1 for r in self.records if r.status != STATUS_SUCCESS),
+            "agent_seconds_mean": round(statistics.mean(agent_seconds), 1) if agent_seconds else 0.0,
+            "agent_seconds_p50": round(_percentile(agent_seconds, 0.5), 1),
+            "agent_seconds_p90": round(_percentile(agent_seconds, 0.9), 1),
+            "stage_seconds": stage_totals,
+            "turns": sum(r.num_turns or 0 for r in self.records),
+            "tokens": tokens,
+            "cost_usd": round(sum(r.total_cost_usd or 0.0 for r in self.records), 4),
+            "comments": sum(r.comment_count or 0 for r in self.records),
+            "slowest_repos": sorted(per_repo.items(), key=lambda kv: kv[1], reverse=True)[:5]
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print("=" * 60)
+        print("Run telemetry")
+        print("=" * 60)
+        print(f"Wall time: {summary['wall_seconds']}s, attempts: {summary['attempts']} "
+              f"({summary['succeeded']} succeeded, {summary['failed']} failed)")
+        print(f"Agent time mean/p50/p90: {summary['agent_seconds_mean']}s / "
+              f"{summary['agent_seconds_p50']}s / {summary['agent_seconds_p90']}s")
+        print(f"Stage totals: {summary['stage_seconds']}")
+        print(f"Turns: {summary['turns']}, tokens: {summary['tokens']}, cost: ${summary['cost_usd']}")
+        print(f"Comments: {summary['comments']}")
+        for repo, seconds in summary["slowest_repos"]:
+            print(f"  {repo}: {seconds:.0f}s")
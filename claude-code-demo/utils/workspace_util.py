@@ -0,0 +1,237 @@
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+
+from .cache_util import MirrorCache
+from .git_util import GitCommandError, repo_lock, run_git
+
+
+def _project_root() -> str:
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+FETCH_PARTIAL = "partial"
+FETCH_FULL = "full"
+
+# keeps git from lazily fetching missing objects from a promisor remote
+NO_LAZY_FETCH = {"GIT_NO_LAZY_FETCH": "1"}
+# deepen a shallow mirror this far at most before fetching the whole history
+MAX_DEEPEN = 1024
+
+
+class WorkspaceManager:
+    """
+    Keep one bare mirror per repository under repos/ and hand out a
+    lightweight git worktree per PR under worktrees/.
+
+    With the partial strategy the mirror starts empty and only the source and
+    target commits are fetched, blobless and depth-limited; blobs are hydrated
+    on demand by git when the worktree is checked out or diffed. The shallow
+    history is deepened until the two commits have a merge base, so the
+    `source...target` diff can be computed. Servers that refuse partial or
+    by-id fetches fall back to a full fetch.
+
+    Mirror creation and worktree bookkeeping are serialized per repository
+    with git_util.repo_lock, so PRs of the same repo can be prepared and
+    reviewed concurrently in one event loop.
+
+    With a cache budget the mirrors are accounted in a MirrorCache and
+    evicted least recently used first; mirrors with a live worktree are pinned.
+    """
+
+    def __init__(self, root: str | None = None, fetch_strategy: str = FETCH_PARTIAL, fetch_depth: int = 1,
+                 cache_budget_bytes: int | None = None):
+        if fetch_strategy not in (FETCH_PARTIAL, FETCH_FULL):
+            raise ValueError(f"Unknown fetch strategy: {fetch_strategy}")
+        root = root or _project_root()
+        self.fetch_strategy = fetch_strategy
+        self.fetch_depth = fetch_depth
+        self.mirror_dir = os.path.join(root, "repos")
+        self.worktree_dir = os.path.join(root, "worktrees")
+        self.cache = MirrorCache(self.mirror_dir, cache_budget_bytes)
+
+    def expect(self, git_repo_url: str):
+        """
+        Record a pending PR of a repo, its mirror is kept over unneeded ones
+        """
+        self.cache.expect(self.mirror_path(git_repo_url))
+
+    def done(self, git_repo_url: str):
+        """
+        Record that a pending PR of a repo has finished
+        """
+        self.cache.done(self.mirror_path(git_repo_url))
+
+    def mirror_path(self, git_repo_url: str) -> str:
+        """
+        Get the bare mirror path of a repo, e.g. repos/FreeCAD__FreeCAD.git
+        """
+        parts = git_repo_url.rstrip('/').split('/')
+        name = parts[-2] + "__" + parts[-1].replace('.git', '')
+        return os.path.join(self.mirror_dir, name + ".git")
+
+    def worktree_path(self, git_repo_url: str, pr_id: str) -> str:
+        repo = git_repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+        return os.path.join(self.worktree_dir, f"{repo}_{pr_id}")
+
+    async def _ensure_mirror(self, git_repo_url: str, mirror: str):
+        """
+        Create the bare mirror once, later calls reuse it
+        """
+        if os.path.exists(os.path.join(mirror, "HEAD")):
+            return
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        tmp_mirror = mirror + ".tmp"
+        shutil.rmtree(tmp_mirror, ignore_errors=True)
+        if self.fetch_strategy == FETCH_FULL:
+            await run_git(['clone', '--bare', git_repo_url, tmp_mirror])
+        else:
+            # empty promisor repo, commits are fetched per PR
+            await run_git(['init', '--bare', tmp_mirror])
+            await run_git(['remote', 'add', 'origin', git_repo_url], cwd=tmp_mirror)
+            await run_git(['config', 'remote.origin.promisor', 'true'], cwd=tmp_mirror)
+            await run_git(['config', 'remote.origin.partialclonefilter', 'blob:none'], cwd=tmp_mirror)
+        os.replace(tmp_mirror, mirror)
+
+    @staticmethod
+    async def _has_commit(mirror: str, commit_id: str) -> bool:
+        # without NO_LAZY_FETCH the probe itself would fetch a missing commit
+        # of the promisor mirror with its full history
+        try:
+            await run_git(['cat-file', '-e', commit_id + '^{commit}'], cwd=mirror, env=NO_LAZY_FETCH)
+            return True
+        except GitCommandError:
+            return False
+
+    async def _fetch_commits(self, mirror: str, pr_id: str, commit_ids: list[str]):
+        """
+        Fetch the (possibly hidden) PR commits into the mirror if missing
+        """
+        missing = [c for c in commit_ids if not await self._has_commit(mirror, c)]
+        if not missing:
+            return
+        if self.fetch_strategy == FETCH_PARTIAL:
+            try:
+                await run_git(['fetch', '--no-tags', '--filter=blob:none', f'--depth={self.fetch_depth}',
+                               'origin', *missing], cwd=mirror)
+                return
+            except GitCommandError as e:
+                print(f"partial fetch refused, falling back to full fetch: {e}")
+        try:
+            await run_git(['fetch', '--no-tags', 'origin', *missing], cwd=mirror)
+        except GitCommandError:
+            # server does not serve commits by id, fetch branches and the PR head
+            await run_git(['fetch', 'origin', '+refs/heads/*:refs/heads/*',
+                           f'+refs/pull/{pr_id}/head:refs/pull/{pr_id}/head'], cwd=mirror)
+        still_missing = [c for c in missing if not await self._has_commit(mirror, c)]
+        if still_missing:
+            raise RuntimeError(f"Commits not found on remote: {', '.join(still_missing)}")
+
+    @staticmethod
+    async def _has_merge_base(mirror: str, source: str, target: str) -> bool:
+        try:
+            await run_git(['merge-base', source, target], cwd=mirror, env=NO_LAZY_FETCH)
+            return True
+        except GitCommandError:
+            return False
+
+    async def _deepen_to_merge_base(self, mirror: str, source: str, target: str):
+        """
+        Deepen a shallow mirror until source and target have a merge base,
+        doubling the depth per round and fetching the whole history past MAX_DEEPEN
+        """
+        depth = self.fetch_depth
+        while os.path.exists(os.path.join(mirror, 'shallow')) \
+                and not await self._has_merge_base(mirror, source, target):
+            if depth >= MAX_DEEPEN:
+                await run_git(['fetch', '--no-tags', '--filter=blob:none', '--unshallow',
+                               'origin', source, target], cwd=mirror)
+                return
+            await run_git(['fetch', '--no-tags', '--filter=blob:none', f'--deepen={depth}',
+                           'origin', source, target], cwd=mirror)
+            depth *= 2
+
+    async def create(self, git_repo_url: str, pr_id: str, source: str, target: str,
+                     timings: dict[str, float] | None = None) -> str:
+        """
+        Create a worktree checked out at the target commit of a PR
+        :param git_repo_url: e.g. https://github.com/gofr-dev/gofr.git
+        :param pr_id: PR number
+        :param source: source commit
+        :param target: target commit
+        :param timings: if given, filled with the seconds spent per stage
+            (lock_wait, clone, fetch, worktree)
+        :return: worktree path
+        """
+        mirror = self.mirror_path(git_repo_url)
+        workspace = self.worktree_path(git_repo_url, pr_id)
+        timings = timings if timings is not None else {}
+        mark = time.monotonic()
+
+        def lap(stage: str):
+            nonlocal mark
+            now = time.monotonic()
+            timings[stage] = round(now - mark, 3)
+            mark = now
+
+        # pinned until release(), so eviction never removes a mirror in use
+        self.cache.pin(mirror)
+        try:
+            async with repo_lock(mirror):
+                lap("lock_wait")
+                await self._ensure_mirror(git_repo_url, mirror)
+                lap("clone")
+                await self._fetch_commits(mirror, pr_id, [source, target])
+                await self._deepen_to_merge_base(mirror, source, target)
+                lap("fetch")
+                if os.path.exists(workspace):
+                    # left over from an interrupted run
+                    await self._remove_worktree(mirror, workspace)
+                os.makedirs(self.worktree_dir, exist_ok=True)
+                await run_git(['worktree', 'add', '--detach', workspace, target], cwd=mirror)
+                lap("worktree")
+                await self.cache.update(mirror)
+        except BaseException:
+            self.cache.unpin(mirror)
+            raise
+        await self.cache.evict()
+        return workspace
+
+    @staticmethod
+    async def _remove_worktree(mirror: str, workspace: str):
+        try:
+            await run_git(['worktree', 'remove', '--force', workspace], cwd=mirror)
+        except GitCommandError:
+            shutil.rmtree(workspace, ignore_errors=True)
+        await run_git(['worktree', 'prune'], cwd=mirror)
+
+    async def release(self, git_repo_url: str, workspace: str):
+        """
+        Remove a PR worktree, the mirror is kept for later PRs.
+        Shielded from cancellation, so a PR cancelled by its deadline still
+        cleans up its worktree.
+        """
+        mirror = self.mirror_path(git_repo_url)
+        with anyio.CancelScope(shield=True):
+            try:
+                async with repo_lock(mirror):
+                    await self._remove_worktree(mirror, workspace)
+                    # blobs hydrated during the review grow the mirror
+                    await self.cache.update(mirror)
+            finally:
+                self.cache.unpin(mirror)
+            await self.cache.evict()
+
+    @asynccontextmanager
+    async def workspace(self, git_repo_url: str, pr_id: str, source: str, target: str):
+        """
+        Context manager yielding a PR worktree that is removed on exit
+        """
+        workspace = await self.create(git_repo_url, pr_id, source, target)
+        try:
+            yield workspace
+        finally:
+            await self.release(git_repo_url, workspace)
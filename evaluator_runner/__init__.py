@@ -1,4 +1,8 @@
 from evaluator_runner.core.evaluator import get_evaluator_ans_from_json, load_generated_comments_from_file
+from evaluator_runner.core.scoreboard import Scoreboard
+from evaluator_runner.core.streaming import stream_evaluations
+from evaluator_runner.core.sampling import evaluate_sampled
+from evaluator_runner.core.verdict_cache import VerdictCache
 from evaluator_runner.utils.config import (
     EvaluatorConfig,
     SemanticMatcherType,
@@ -12,6 +16,10 @@ from evaluator_runner.utils.config import (
 __all__ = [
     'get_evaluator_ans_from_json',
     'load_generated_comments_from_file',
+    'Scoreboard',
+    'stream_evaluations',
+    'evaluate_sampled',
+    'VerdictCache',
     'EvaluatorConfig',
     'SemanticMatcherType',
     'FilterConfig',
@@ -0,0 +1,180 @@
+"""
+Endpoint Pool Module
+
+Load balancing of semantic matcher requests over interchangeable model
+deployments, each with its own weight, concurrency cap and health state.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from openai import AsyncOpenAI
+
+
+class Endpoint:
+    """One model deployment"""
+
+    def __init__(
+            self,
+            base_url: str,
+            api_key: str,
+            model: str,
+            weight: float = 1.0,
+            max_concurrency: Optional[int] = None
+    ):
+        if weight <= 0:
+            raise ValueError("endpoint weight must be positive")
+        self.base_url = base_url
+        self.model = model
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def is_full(self) -> bool:
+        return self.max_concurrency is not None and self.outstanding >= self.max_concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected": self.is_ejected(time.monotonic())
+        }
+
+
+def load_endpoints(prefix: str) -> List[Endpoint]:
+    """
+    Build the endpoints of a matcher from environment variables.
+
+    `{prefix}_ENDPOINTS` may hold a JSON list of endpoints, e.g.
+    [{"base_url": "...", "api_key": "...", "model": "...", "weight": 2, "max_concurrency": 16}];
+    keys missing from an entry default to `{prefix}_MODEL_URL`, `{prefix}_API_KEY`
+    and `{prefix}_MODEL`. Without it, those three variables define a single endpoint.
+
+    Args:
+        prefix: Variable prefix, e.g. "LLM" or "EMBEDDING"
+    """
+    defaults = {
+        "base_url": os.getenv(f"{prefix}_MODEL_URL"),
+        "api_key": os.getenv(f"{prefix}_API_KEY"),
+        "model": os.getenv(f"{prefix}_MODEL")
+    }
+    raw = os.getenv(f"{prefix}_ENDPOINTS")
+    if not raw:
+        return [Endpoint(**defaults)]
+    try:
+        entries = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{prefix}_ENDPOINTS is not valid JSON: {e}") from None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{prefix}_ENDPOINTS must be a non-empty JSON list")
+    return [Endpoint(**{**defaults, **entry}) for entry in entries]
+
+
+class EndpointPool:
+    """
+    Route requests to the least loaded healthy endpoint.
+
+    The load of an endpoint is its number of outstanding requests divided by
+    its weight, so a weight-2 endpoint carries twice the concurrent requests of
+    a weight-1 one. Endpoints at their concurrency cap are skipped; when all
+    are at their caps, requests wait for a free slot.
+
+    After `eject_after` consecutive errors an endpoint is ejected for
+    `eject_seconds`, doubled for every further ejection up to
+    `max_eject_seconds`. When the ejection expires the endpoint is tried
+    again: one success reinstates it, one error ejects it again. If every
+    endpoint is ejected, requests go to the one that returns first rather
+    than failing outright.
+    """
+
+    def __init__(
+            self,
+            endpoints: Sequence[Endpoint],
+            eject_after: int = 3,
+            eject_seconds: float = 30.0,
+            max_eject_seconds: float = 600.0
+    ):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _pick(self, exclude: Sequence[Endpoint]) -> Optional[Endpoint]:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+        candidates = [e for e in candidates if not e.is_full()]
+        healthy = [e for e in candidates if not e.is_ejected(now)]
+        if healthy:
+            return min(healthy, key=lambda e: (e.outstanding + 1) / e.weight)
+        if candidates and all(e.is_ejected(now) for e in self.endpoints):
+            return min(candidates, key=lambda e: e.ejected_until)
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, exclude: Sequence[Endpoint] = ()) -> AsyncIterator[Endpoint]:
+        """
+        Reserve a slot on the endpoint that should serve the next request.
+
+        Args:
+            exclude: Endpoints to avoid, e.g. ones that already failed this request
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            endpoint = self._pick(exclude)
+            while endpoint is None:
+                # woken by a released slot; ejections expire without a wake-up
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                endpoint = self._pick(exclude)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        finally:
+            endpoint.outstanding -= 1
+            async with self._condition:
+                self._condition.notify_all()
+
+    def record_success(self, endpoint: Endpoint):
+        if endpoint.ejections:
+            logging.info(f"Endpoint {endpoint.base_url} recovered")
+        endpoint.consecutive_failures = 0
+        endpoint.ejections = 0
+        endpoint.ejected_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint):
+        endpoint.errors += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_after and not endpoint.is_ejected(time.monotonic()):
+            delay = min(self.eject_seconds * 2 ** endpoint.ejections, self.max_eject_seconds)
+            endpoint.ejections += 1
+            endpoint.ejected_until = time.monotonic() + delay
+            logging.warning(f"Endpoint {endpoint.base_url} ejected for {delay:g}s "
+                            f"after {endpoint.consecutive_failures} consecutive errors")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
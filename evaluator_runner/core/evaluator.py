@@ -3,7 +3,7 @@ Evaluator Module
 
 Provides core functionality for code review comment quality evaluation.
 """
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
 from dataclasses import dataclass, field
 import logging
 import re
@@ -13,8 +13,11 @@ from evaluator_runner.core.matcher_factory import get_semantic_matcher, Semantic
 from evaluator_runner.core.match_location import (
     extract_comment_location,
     match_location,
-    CommentLocation
+    CommentLocation,
+    LocationIndex
 )
+from evaluator_runner.core.match_dedup import cluster_generated_comments
+from evaluator_runner.core.match_cascade import score_pairs
 
 def parse_github_pr_url(url: str) -> Dict[str, str]:
     """Parse repository name and PR number from GitHub PR URL"""
@@ -47,6 +50,11 @@ class MatchRecord:
     matched_reference_details: Dict[str, Any] = field(default_factory=dict)
     location_match_details: Dict[str, Any] = field(default_factory=dict)
     llm_comparison: Optional[Dict[str, Any]] = None
+    duplicate_of: Optional[int] = None
+    negative_line_match: bool = False
+    negative_match: bool = False
+    matched_negative_reference: Optional[Dict[str, Any]] = None
+    cascade_verdicts: List[Dict[str, Any]] = field(default_factory=list)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -60,7 +68,12 @@ class MatchRecord:
             "matched_reference_location": self.matched_reference_location,
             "matched_reference_details": self.matched_reference_details,
             "location_match_details": self.location_match_details,
-            "llm_comparison": self.llm_comparison
+            "llm_comparison": self.llm_comparison,
+            "duplicate_of": self.duplicate_of,
+            "negative_line_match": self.negative_line_match,
+            "negative_match": self.negative_match,
+            "matched_negative_reference": self.matched_negative_reference,
+            "cascade_verdicts": self.cascade_verdicts
         }
 
 @dataclass
@@ -71,6 +84,17 @@ class MatchStatistics:
     unmatched_count: int = 0
     total_generated: int = 0
     total_good: int = 0
+    negative_matches: int = 0
+    negative_line_matches: int = 0
+    total_bad: int = 0
+    semantic_calls: int = 0
+    reused_verdicts: int = 0
+    dedup_clusters: int = 0
+    cascade_scored_pairs: int = 0
+    cascade_accepted: int = 0
+    cascade_rejected: int = 0
+    cascade_llm_calls: int = 0
+    cascade_embedding_failed: bool = False
     match_details: List[Dict[str, Any]] = field(default_factory=list)
 
 def _extract_reference_details(comment: Dict[str, Any]) -> Dict[str, Any]:
@@ -165,16 +189,28 @@ async def _try_match_with_reference(
         matched_good_ids: set,
         matched_good_ids_by_line: set,
         match_record: MatchRecord,
-        semantic_match_func: Optional[SemanticMatchFunc] = None
+        semantic_match_func: Optional[SemanticMatchFunc] = None,
+        ref_loc: Optional[CommentLocation] = None,
+        reference_key: Any = None
 ) -> Tuple[bool, bool]:
-    """Try to match generated comment with a reference comment"""
+    """
+    Try to match generated comment with a reference comment.
+
+    `reference_key` identifies the reference in the matched sets; it defaults
+    to the comment id, as positive references have always been keyed.
+    Negative samples carry no id, so they are keyed by their LocationIndex
+    position instead.
+    """
     comment_id = good_comment.get("id")
     reference_note = good_comment.get("note", "")
+    if reference_key is None:
+        reference_key = comment_id
 
     if not reference_note:
         return False, False
 
-    ref_loc = extract_comment_location(good_comment, is_generated=False)
+    if ref_loc is None:
+        ref_loc = extract_comment_location(good_comment, is_generated=False)
     location_result = match_location(gen_loc, ref_loc, comment_id, line_distance_threshold)
 
     if not location_result.is_match:
@@ -183,8 +219,8 @@ async def _try_match_with_reference(
     line_matched = False
     semantic_matched = False
 
-    if comment_id not in matched_good_ids_by_line:
-        matched_good_ids_by_line.add(comment_id)
+    if reference_key not in matched_good_ids_by_line:
+        matched_good_ids_by_line.add(reference_key)
         line_matched = True
 
         match_record.line_match = True
@@ -194,11 +230,20 @@ async def _try_match_with_reference(
         match_record.matched_reference_details = _extract_reference_details(good_comment)
         match_record.location_match_details = location_result.to_dict()["details"]
 
-    if semantic_match_func is not None and comment_id not in matched_good_ids:
+    if semantic_match_func is not None and reference_key not in matched_good_ids:
         similarity_result = await semantic_match_func(gen_note, reference_note)
+        if "stage" in similarity_result:
+            # every cascade verdict, accepted or not, for auditing against the LLM
+            match_record.cascade_verdicts.append({
+                "reference_id": comment_id,
+                "reference_note": reference_note,
+                "stage": similarity_result["stage"],
+                "similarity": similarity_result.get("similarity"),
+                "is_similar": similarity_result.get("is_similar", False)
+            })
 
         if similarity_result.get("is_similar", False):
-            matched_good_ids.add(comment_id)
+            matched_good_ids.add(reference_key)
             semantic_matched = True
 
             match_record.semantic_match = True
@@ -212,27 +257,172 @@ async def _try_match_with_reference(
                 "reason": similarity_result.get("reason"),
                 "raw_response": similarity_result.get("raw_response")
             }
+            if "stage" in similarity_result:
+                match_record.llm_comparison["stage"] = similarity_result["stage"]
+                match_record.llm_comparison["similarity"] = similarity_result.get("similarity")
 
     return line_matched, semantic_matched
 
+def _make_cluster_match_func(
+        semantic_match_func: SemanticMatchFunc,
+        representative_note: str,
+        representative: int,
+        verdict_cache: Dict[Tuple[int, str], Dict[str, Any]],
+        stats: MatchStatistics
+) -> SemanticMatchFunc:
+    """
+    Wrap the semantic matcher so that every member of a near-duplicate cluster
+    reuses the verdict judged for its representative.
+
+    The greedy loop still visits references in the same order for every
+    generated comment; only the semantic call itself is shared.
+    """
+    async def _match(gen_note: str, reference_note: str) -> Dict[str, Any]:
+        key = (representative, reference_note)
+        if key in verdict_cache:
+            stats.reused_verdicts += 1
+            return verdict_cache[key]
+        stats.semantic_calls += 1
+        result = await semantic_match_func(representative_note, reference_note)
+        verdict_cache[key] = result
+        return result
+
+    return _match
+
+def _collect_location_pairs(
+        generated_comments: List[Dict[str, Any]],
+        cluster_of: Dict[int, int],
+        candidates: List[Dict[str, Any]],
+        location_index: LocationIndex,
+        line_distance_threshold: int
+) -> set:
+    """
+    Collect the (generated note, reference note) pairs that pass location
+    matching, i.e. every pair the greedy loop may judge semantically.
+
+    Generated comments are represented by their cluster representative, whose
+    note is the one actually judged.
+    """
+    pairs = set()
+    for position, gen_comment in enumerate(generated_comments):
+        if not isinstance(gen_comment, dict) or not gen_comment.get("note"):
+            continue
+        gen_loc = extract_comment_location(gen_comment, is_generated=True)
+        gen_note = generated_comments[cluster_of.get(position, position)].get("note", "")
+        for candidate in location_index.candidates(gen_loc):
+            reference = candidates[candidate]
+            if not reference.get("note"):
+                continue
+            location_result = match_location(
+                gen_loc, location_index.locations[candidate], reference.get("id"), line_distance_threshold
+            )
+            if location_result.is_match:
+                pairs.add((gen_note, reference["note"]))
+    return pairs
+
+def _make_cascade_match_func(
+        judge: SemanticMatchFunc,
+        scores: Dict[Tuple[str, str], float],
+        config: EvaluatorConfig,
+        stats: MatchStatistics
+) -> SemanticMatchFunc:
+    """
+    Wrap the LLM judge so that pairs whose embedding similarity is clearly
+    high or low are decided without it.
+
+    Every verdict records the stage that decided it ("embedding" or "llm")
+    and the embedding similarity, and is kept in the match record's
+    cascade_verdicts whether accepted or not; pairs without a score go to
+    the judge.
+    """
+    async def _match(gen_note: str, reference_note: str) -> Dict[str, Any]:
+        similarity = scores.get((gen_note, reference_note))
+        if similarity is not None and similarity >= config.cascade_accept_threshold:
+            stats.cascade_accepted += 1
+            return {
+                "is_similar": True,
+                "reason": f"embedding similarity {similarity:.3f} >= {config.cascade_accept_threshold}",
+                "raw_response": None,
+                "stage": "embedding",
+                "similarity": round(similarity, 4)
+            }
+        if similarity is not None and similarity < config.cascade_reject_threshold:
+            stats.cascade_rejected += 1
+            return {
+                "is_similar": False,
+                "reason": f"embedding similarity {similarity:.3f} < {config.cascade_reject_threshold}",
+                "raw_response": None,
+                "stage": "embedding",
+                "similarity": round(similarity, 4)
+            }
+        stats.cascade_llm_calls += 1
+        result = await judge(gen_note, reference_note)
+        return {
+            **result,
+            "stage": "llm",
+            "similarity": round(similarity, 4) if similarity is not None else None
+        }
+
+    return _match
+
 async def _match_all_comments(
         generated_comments: List[Dict[str, Any]],
         good_comments: List[Dict[str, Any]],
-        config: EvaluatorConfig
+        config: EvaluatorConfig,
+        bad_comments: Optional[List[Dict[str, Any]]] = None,
+        semantic_match_func: Optional[SemanticMatchFunc] = None,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
 ) -> MatchStatistics:
-    """Execute matching for all comments"""
+    """
+    Execute matching for all comments.
+
+    Positive (good) and negative (bad) references are matched in a single
+    pass over one location index; a generated comment stops at its first
+    semantic match of either polarity. `on_record` is called with each match
+    record as soon as its generated comment is resolved.
+    """
     stats = MatchStatistics()
 
     if not generated_comments:
         stats.total_good = len(good_comments)
+        stats.total_bad = len(bad_comments or [])
         return stats
 
-    semantic_match_func = None
-    if config.enable_semantic_match:
+    if not config.enable_semantic_match:
+        semantic_match_func = None
+    elif semantic_match_func is None:
         semantic_match_func = get_semantic_matcher(config.semantic_matcher_type)
 
+    cluster_of = {}
+    if semantic_match_func is not None and config.enable_comment_dedup:
+        cluster_of = cluster_generated_comments(generated_comments, config.dedup_similarity_threshold)
+        stats.dedup_clusters = len(set(cluster_of.values()))
+
+    # Positive references come first so that positive metrics are identical
+    # to a positive-only evaluation; negatives are only reached when no
+    # positive reference matched semantically.
+    candidates = list(good_comments) + list(bad_comments or [])
+    location_index = LocationIndex(candidates)
+
+    if semantic_match_func is not None and config.semantic_matcher_type == SemanticMatcherType.CASCADE:
+        pairs = _collect_location_pairs(
+            generated_comments, cluster_of, candidates, location_index, config.line_distance_threshold
+        )
+        scores = await score_pairs(pairs)
+        if scores is None:
+            # every pair of this PR falls back to the LLM judge
+            stats.cascade_embedding_failed = True
+            scores = {}
+        stats.cascade_scored_pairs = len(scores)
+        semantic_match_func = _make_cascade_match_func(semantic_match_func, scores, config, stats)
+
+    verdict_cache: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    # positives keyed by comment id as before, negatives (which carry no id)
+    # by LocationIndex position
     matched_good_ids = set()
     matched_good_ids_by_line = set()
+    matched_bad_ids = set()
+    matched_bad_ids_by_line = set()
 
     for idx, gen_comment in enumerate(generated_comments, 1):
         if not isinstance(gen_comment, dict) or not gen_comment.get("note"):
@@ -247,18 +437,51 @@ async def _match_all_comments(
             generated_location=gen_loc.to_dict()
         )
 
+        representative = cluster_of.get(idx - 1, idx - 1)
+        if representative != idx - 1:
+            match_record.duplicate_of = representative + 1
+
+        comment_match_func = semantic_match_func
+        if semantic_match_func is not None and cluster_of:
+            comment_match_func = _make_cluster_match_func(
+                semantic_match_func,
+                generated_comments[representative].get("note", ""),
+                representative,
+                verdict_cache,
+                stats
+            )
+
         matched = False
         line_matched = False
+        negative_line_matched = False
+        negative_record = MatchRecord(
+            generated_comment_index=idx,
+            generated_comment=gen_note,
+            generated_location=match_record.generated_location
+        )
 
-        for good_comment in good_comments:
+        for position in location_index.candidates(gen_loc):
+            is_negative = position >= len(good_comments)
             line_match_result, semantic_match_result = await _try_match_with_reference(
-                gen_note, gen_loc, good_comment,
+                gen_note, gen_loc, candidates[position],
                 config.line_distance_threshold,
-                matched_good_ids, matched_good_ids_by_line,
-                match_record,
-                semantic_match_func
+                matched_bad_ids if is_negative else matched_good_ids,
+                matched_bad_ids_by_line if is_negative else matched_good_ids_by_line,
+                negative_record if is_negative else match_record,
+                comment_match_func,
+                ref_loc=location_index.locations[position],
+                reference_key=position if is_negative else None
             )
 
+            if is_negative:
+                if line_match_result and not negative_line_matched:
+                    stats.negative_line_matches += 1
+                    negative_line_matched = True
+                if semantic_match_result:
+                    stats.negative_matches += 1
+                    break
+                continue
+
             if line_match_result and not line_matched:
                 stats.positive_line_matches += 1
                 line_matched = True
@@ -268,13 +491,32 @@ async def _match_all_comments(
                 matched = True
                 break
 
+        if bad_comments is not None:
+            match_record.negative_line_match = negative_record.line_match
+            match_record.negative_match = negative_record.semantic_match
+            if negative_record.line_match:
+                match_record.matched_negative_reference = {
+                    "reference_id": negative_record.matched_reference_id,
+                    "reference_note": negative_record.matched_reference_note,
+                    "reference_location": negative_record.matched_reference_location,
+                    "reference_details": negative_record.matched_reference_details,
+                    "llm_comparison": negative_record.llm_comparison
+                }
+            match_record.cascade_verdicts = (
+                [{**verdict, "negative": False} for verdict in match_record.cascade_verdicts] +
+                [{**verdict, "negative": True} for verdict in negative_record.cascade_verdicts]
+            )
+
         if not matched and config.enable_semantic_match:
             stats.unmatched_count += 1
 
         stats.match_details.append(match_record.to_dict())
+        if on_record is not None:
+            on_record(stats.match_details[-1])
 
     stats.total_generated = _count_valid_comments(generated_comments)
     stats.total_good = _count_valid_comments(good_comments)
+    stats.total_bad = _count_valid_comments(bad_comments or [])
 
     return stats
 
@@ -295,6 +537,24 @@ def _extract_matched_references(match_details: List[Dict[str, Any]]) -> List[Dic
 
     return matched_references
 
+def _extract_matched_negatives(match_details: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Extract negative reference comments matched by generated comments"""
+    matched_negatives = []
+
+    for detail in match_details:
+        if detail.get("negative_match"):
+            negative = detail.get("matched_negative_reference") or {}
+            matched_negatives.append({
+                "reference_comment_id": negative.get("reference_id"),
+                "reference_note": negative.get("reference_note"),
+                "reference_location": negative.get("reference_location"),
+                "reference_details": negative.get("reference_details"),
+                "matched_by_generated_index": detail.get("generated_comment_index"),
+                "matched_by_generated_note": detail.get("generated_comment")
+            })
+
+    return matched_negatives
+
 def _extract_llm_comparisons(match_details: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Extract LLM comparison info from match details"""
     llm_comparisons = []
@@ -309,6 +569,8 @@ def _extract_llm_comparisons(match_details: List[Dict[str, Any]]) -> List[Dict[s
                 "is_similar": detail.get("llm_comparison", {}).get("is_similar"),
                 "llm_response": detail.get("llm_comparison", {}).get("raw_response")
             })
+            if "stage" in detail["llm_comparison"]:
+                llm_comparisons[-1]["stage"] = detail["llm_comparison"]["stage"]
 
     return llm_comparisons
 
@@ -317,7 +579,10 @@ async def get_evaluator_ans_from_json(
         generated_comments: List[Dict[str, Any]],
         good_comments: List[Dict[str, Any]],
         config: EvaluatorConfig = None,
-        pr_metadata: Dict[str, Any] = None
+        pr_metadata: Dict[str, Any] = None,
+        bad_comments: Optional[List[Dict[str, Any]]] = None,
+        semantic_match_func: Optional[SemanticMatchFunc] = None,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None
 ) -> Dict[str, Any]:
     """
     Evaluate generated review comment quality.
@@ -328,6 +593,12 @@ async def get_evaluator_ans_from_json(
         good_comments: List of reference comments
         config: Evaluator configuration
         pr_metadata: PR metadata (contains category, project_main_language, etc.)
+        bad_comments: Optional list of known-bad reference comments (negative samples),
+            matched in the same pass to report false positives
+        semantic_match_func: Optional replacement of the matcher selected by
+            config.semantic_matcher_type, e.g. one wrapped by a VerdictCache
+        on_record: Optional callback receiving each entry of match_details as
+            soon as its generated comment is resolved
 
     Returns:
         Dictionary containing evaluation results
@@ -340,6 +611,7 @@ async def get_evaluator_ans_from_json(
         evaluation_id = get_evaluation_id(github_pr_url)
 
         filtered_good_comments = good_comments
+        filtered_bad_comments = bad_comments
         filter_applied = False
 
         if config.filter_config:
@@ -358,9 +630,14 @@ async def get_evaluator_ans_from_json(
 
             if config.filter_config.has_comment_filter():
                 filtered_good_comments = config.filter_config.filter_comments(good_comments)
+                if bad_comments is not None:
+                    filtered_bad_comments = config.filter_config.filter_comments(bad_comments)
                 filter_applied = True
 
-        stats = await _match_all_comments(generated_comments, filtered_good_comments, config)
+        stats = await _match_all_comments(
+            generated_comments, filtered_good_comments, config, filtered_bad_comments,
+            semantic_match_func, on_record
+        )
 
         positive_expected_nums = stats.total_good
 
@@ -390,6 +667,37 @@ async def get_evaluator_ans_from_json(
             "llm_comparisons": _extract_llm_comparisons(stats.match_details)
         }
 
+        if bad_comments is not None:
+            negative_expected_nums = stats.total_bad
+            result.update({
+                "negative_expected_nums": negative_expected_nums,
+                "negative_match_nums": stats.negative_matches,
+                "negative_line_match_nums": stats.negative_line_matches,
+                "negative_match_rate": round(_calculate_rate(stats.negative_matches, stats.total_generated), 3),
+                "negative_recall_rate": round(_calculate_rate(stats.negative_matches, negative_expected_nums), 3),
+                "negative_line_match_rate": round(_calculate_rate(stats.negative_line_matches, stats.total_generated), 3),
+                "matched_negative_comments": _extract_matched_negatives(stats.match_details)
+            })
+
+        if config.enable_comment_dedup:
+            result["dedup"] = {
+                "similarity_threshold": config.dedup_similarity_threshold,
+                "clusters": stats.dedup_clusters,
+                "semantic_calls": stats.semantic_calls,
+                "reused_verdicts": stats.reused_verdicts
+            }
+
+        if config.enable_semantic_match and config.semantic_matcher_type == SemanticMatcherType.CASCADE:
+            result["cascade"] = {
+                "accept_threshold": config.cascade_accept_threshold,
+                "reject_threshold": config.cascade_reject_threshold,
+                "scored_pairs": stats.cascade_scored_pairs,
+                "accepted_by_embedding": stats.cascade_accepted,
+                "rejected_by_embedding": stats.cascade_rejected,
+                "llm_calls": stats.cascade_llm_calls,
+                "embedding_failed": stats.cascade_embedding_failed
+            }
+
         if config.filter_config:
             result["filter_config"] = {
                 "pr_categories": config.filter_config.pr_categories,
@@ -400,6 +708,9 @@ async def get_evaluator_ans_from_json(
             if filter_applied:
                 result["original_good_comments_count"] = len(good_comments)
                 result["filtered_good_comments_count"] = len(filtered_good_comments)
+                if bad_comments is not None:
+                    result["original_bad_comments_count"] = len(bad_comments)
+                    result["filtered_bad_comments_count"] = len(filtered_bad_comments)
 
         return result
     except Exception as e:
@@ -0,0 +1,123 @@
+"""
+Request Hedging Module
+
+Duplicates slow semantic calls so that a single slow completion does not hold
+up a whole PR.
+"""
+import os
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class HedgingPolicy:
+    """
+    Decide when a slow call gets a duplicate request.
+
+    The hedge delay is the `percentile` of the latencies of the last `window`
+    successful calls, at least `min_delay` seconds; no call is hedged before
+    `min_samples` latencies are known. At most `max_ratio` of all calls are
+    hedged, so a uniformly slow backend does not get twice the load; hedges
+    are counted when they are fired, so the cap also holds for concurrent
+    calls that outlive the delay at the same time.
+
+    Besides the hedge counters the policy keeps the end-to-end latencies of
+    the calls it covered, to compare the tail with the median.
+    """
+
+    def __init__(
+            self,
+            percentile: float = 0.95,
+            window: int = 500,
+            min_samples: int = 20,
+            min_delay: float = 0.1,
+            max_ratio: float = 0.1
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("hedge percentile must be in (0, 1)")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self._latencies = deque(maxlen=window)
+        self._call_latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.extra_prompt_tokens = 0
+
+    def record_latency(self, seconds: float):
+        """Latency of one successful request"""
+        self._latencies.append(seconds)
+
+    def record_call(self, seconds: float):
+        """End-to-end latency of one call, hedged or not"""
+        self.calls += 1
+        self._call_latencies.append(seconds)
+
+    def _below_cap(self) -> bool:
+        return self.hedged < self.max_ratio * (self.calls + 1)
+
+    def delay(self) -> Optional[float]:
+        """Seconds after which the next call is hedged, None to not hedge it"""
+        if len(self._latencies) < self.min_samples or not self._below_cap():
+            return None
+        return max(_percentile(self._latencies, self.percentile), self.min_delay)
+
+    def fire_hedge(self) -> bool:
+        """Claim a hedge for a call that outlived the delay, False once the cap is reached"""
+        if not self._below_cap():
+            return False
+        self.hedged += 1
+        return True
+
+    def record_hedge(self, hedge_won: bool, prompt_tokens: int = 0):
+        """
+        Record the outcome of a fired hedge.
+
+        Args:
+            hedge_won: The duplicate returned first
+            prompt_tokens: Prompt tokens of the call, sent twice because of the hedge
+        """
+        if hedge_won:
+            self.hedge_wins += 1
+        self.extra_prompt_tokens += prompt_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "percentile": self.percentile,
+            "delay_seconds": round(self.delay() or 0.0, 3),
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "extra_requests": self.hedged,
+            "extra_prompt_tokens": self.extra_prompt_tokens,
+            "latency_p50": round(_percentile(self._call_latencies, 0.5), 3),
+            "latency_p99": round(_percentile(self._call_latencies, 0.99), 3)
+        }
+
+
+def load_hedging(prefix: str) -> Optional[HedgingPolicy]:
+    """
+    Build the hedging policy of a matcher from environment variables.
+
+    Hedging is enabled by `{prefix}_HEDGE_PERCENTILE` (e.g. 0.95);
+    `{prefix}_HEDGE_MAX_RATIO` caps the share of hedged calls (default 0.1).
+
+    Args:
+        prefix: Variable prefix, e.g. "LLM" or "EMBEDDING"
+    """
+    percentile = os.getenv(f"{prefix}_HEDGE_PERCENTILE")
+    if not percentile:
+        return None
+    return HedgingPolicy(
+        percentile=float(percentile),
+        max_ratio=float(os.getenv(f"{prefix}_HEDGE_MAX_RATIO", "0.1"))
+    )
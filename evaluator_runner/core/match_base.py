@@ -3,12 +3,16 @@ Semantic Matching Base Module
 
 Provides common abstractions and utilities for LLM/Embedding semantic matching.
 """
+import asyncio
+import time
 from abc import ABC
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from pathlib import Path
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from evaluator_runner.core.endpoint_pool import Endpoint, EndpointPool
+from evaluator_runner.core.hedging import HedgingPolicy
+
 # Load .env from the correct path
 env_path = Path(__file__).parent.parent / 'utils' / '.env'
 load_dotenv(env_path)
@@ -79,11 +83,30 @@ def parse_similarity_response(response_text: str) -> bool:
     return has_positive
 
 class BaseSemanticMatcher(ABC):
-    """Abstract base class for semantic matchers"""
+    """
+    Abstract base class for semantic matchers.
+
+    Requests are balanced over one or more interchangeable endpoints; a call
+    that fails on one endpoint is retried on the others before the match is
+    reported as an error. With a hedging policy, a call still running after
+    the policy's delay gets a duplicate request, on another endpoint when
+    there is one; the first answer wins and the other request is cancelled.
+    """
 
-    def __init__(self, base_url: str, api_key: str, model: str):
-        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key)
-        self.model = model
+    def __init__(
+            self,
+            base_url: str = None,
+            api_key: str = None,
+            model: str = None,
+            endpoints: Optional[List[Endpoint]] = None,
+            hedging: Optional[HedgingPolicy] = None
+    ):
+        if endpoints is None:
+            endpoints = [Endpoint(base_url, api_key, model)]
+        self.pool = EndpointPool(endpoints)
+        self.hedging = hedging
+        self.client = endpoints[0].client
+        self.model = endpoints[0].model
 
     def _build_prompt(self, comment1: str, comment2: str) -> str:
         """Build comparison prompt"""
@@ -92,6 +115,77 @@ class BaseSemanticMatcher(ABC):
             comment2=comment2
         )
 
+    async def _request(self, prompt: str, exclude: List[Endpoint], in_use: List[Endpoint]):
+        """
+        Send the prompt to one endpoint.
+
+        The chosen endpoint is added to `in_use` while the request runs, and to
+        `exclude` if it fails.
+        """
+        async with self.pool.acquire(exclude=exclude + in_use) as endpoint:
+            in_use.append(endpoint)
+            started = time.monotonic()
+            try:
+                response = await endpoint.client.chat.completions.create(
+                    model=endpoint.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=40000,
+                    top_p=0.95,
+                )
+                result_text = response.choices[0].message.content.strip()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.pool.record_failure(endpoint)
+                exclude.append(endpoint)
+                raise
+            finally:
+                in_use.remove(endpoint)
+            self.pool.record_success(endpoint)
+            if self.hedging is not None:
+                self.hedging.record_latency(time.monotonic() - started)
+            return result_text, response
+
+    async def _hedged_request(self, prompt: str, exclude: List[Endpoint]) -> str:
+        """Send the prompt, duplicating the request if it is slower than the hedging delay"""
+        in_use = []
+        delay = self.hedging.delay()
+        primary = asyncio.ensure_future(self._request(prompt, exclude, in_use))
+        if delay is None:
+            return (await primary)[0]
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()[0]
+            if not self.hedging.fire_hedge():
+                # other calls used up the hedge budget while this one waited
+                return (await primary)[0]
+            hedge = asyncio.ensure_future(self._request(prompt, exclude, in_use))
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    result_text, response = task.result()
+                    usage = getattr(response, "usage", None)
+                    self.hedging.record_hedge(
+                        hedge_won=task is hedge,
+                        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0
+                    )
+                    return result_text
+            self.hedging.record_hedge(hedge_won=False)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
     async def match(self, comment1: str, comment2: str) -> SemanticMatchResult:
         """
         Compare whether two comments express the same meaning.
@@ -104,27 +198,43 @@ class BaseSemanticMatcher(ABC):
             SemanticMatchResult object
         """
         prompt = self._build_prompt(comment1, comment2)
+        started = time.monotonic()
 
+        tried = []
+        error = None
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=40000,
-                top_p=0.95,
-            )
-
-            result_text = response.choices[0].message.content.strip()
-            is_similar = parse_similarity_response(result_text)
-
-            return SemanticMatchResult(
-                is_similar=is_similar,
-                reason=result_text.lower(),
-                raw_response=result_text.lower()
-            )
-        except Exception as e:
-            return SemanticMatchResult(
-                is_similar=False,
-                reason=f"ERROR: {str(e)}",
-                raw_response=None
-            )
\ No newline at end of file
+            for _ in range(len(self.pool.endpoints)):
+                try:
+                    if self.hedging is None:
+                        result_text, _ = await self._request(prompt, tried, [])
+                    else:
+                        result_text = await self._hedged_request(prompt, tried)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    continue
+
+                is_similar = parse_similarity_response(result_text)
+
+                return SemanticMatchResult(
+                    is_similar=is_similar,
+                    reason=result_text.lower(),
+                    raw_response=result_text.lower()
+                )
+        finally:
+            if self.hedging is not None:
+                self.hedging.record_call(time.monotonic() - started)
+
+        return SemanticMatchResult(
+            is_similar=False,
+            reason=f"ERROR: {str(error)}",
+            raw_response=None
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Endpoint and hedging statistics"""
+        return {
+            "endpoints": self.pool.stats(),
+            "hedging": self.hedging.stats() if self.hedging is not None else None
+        }
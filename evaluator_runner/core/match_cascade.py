@@ -0,0 +1,113 @@
+"""
+Cascade Semantic Matching Module
+
+Scores comment pairs with embedding cosine similarity so that only the
+ambiguous ones need an LLM verdict.
+"""
+import asyncio
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from evaluator_runner.core.endpoint_pool import EndpointPool, load_endpoints
+
+# Load .env from the correct path
+env_path = Path(__file__).parent.parent / 'utils' / '.env'
+load_dotenv(env_path)
+
+def cosine_similarity(vector1: List[float], vector2: List[float]) -> float:
+    """Cosine similarity of two vectors, 0.0 if either is zero"""
+    dot = sum(a * b for a, b in zip(vector1, vector2))
+    norm = math.sqrt(sum(a * a for a in vector1)) * math.sqrt(sum(b * b for b in vector2))
+    return dot / norm if norm else 0.0
+
+class EmbeddingScorer:
+    """
+    Embeds comments through the embeddings API of the EMBEDDING endpoints.
+
+    Texts are sent in batches of `batch_size`; a batch that fails on one
+    endpoint is retried on the others. Passes that fail on every endpoint
+    are counted in stats().
+    """
+
+    def __init__(self, batch_size: int = 64):
+        # EMBEDDING_ENDPOINTS, or the single EMBEDDING_MODEL_URL/EMBEDDING_API_KEY/EMBEDDING_MODEL endpoint
+        self.pool = EndpointPool(load_endpoints('EMBEDDING'))
+        self.batch_size = batch_size
+        self.passes = 0
+        self.failed_passes = 0
+        self.last_error = None
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        tried = []
+        error = None
+        for _ in range(len(self.pool.endpoints)):
+            async with self.pool.acquire(exclude=tried) as endpoint:
+                try:
+                    response = await endpoint.client.embeddings.create(model=endpoint.model, input=texts)
+                except Exception as e:
+                    self.pool.record_failure(endpoint)
+                    tried.append(endpoint)
+                    error = e
+                    continue
+                self.pool.record_success(endpoint)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        raise error
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, preserving their order"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def score_pairs(self, pairs: Iterable[Tuple[str, str]]) -> Optional[Dict[Tuple[str, str], float]]:
+        """
+        Score comment pairs with one embedding pass over their distinct texts.
+
+        Returns:
+            Cosine similarity per (comment1, comment2) pair; None if the
+            embeddings could not be computed
+        """
+        pairs = set(pairs)
+        texts = sorted({text for pair in pairs for text in pair})
+        if not texts:
+            return {}
+        self.passes += 1
+        try:
+            vectors = dict(zip(texts, await self.embed(texts)))
+        except Exception as e:
+            self.failed_passes += 1
+            self.last_error = str(e)
+            logging.warning(f"Cascade embedding pass failed, all pairs go to the LLM: {e}")
+            return None
+        return {(a, b): cosine_similarity(vectors[a], vectors[b]) for a, b in pairs}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoints": self.pool.stats(),
+            "embedding_passes": self.passes,
+            "failed_embedding_passes": self.failed_passes,
+            "last_error": self.last_error
+        }
+
+_matcher_instance = None
+
+def _get_matcher() -> EmbeddingScorer:
+    """Get scorer singleton"""
+    global _matcher_instance
+    if _matcher_instance is None:
+        _matcher_instance = EmbeddingScorer()
+    return _matcher_instance
+
+async def score_pairs(pairs: Iterable[Tuple[str, str]]) -> Optional[Dict[Tuple[str, str], float]]:
+    """
+    Score comment pairs by embedding cosine similarity.
+
+    Args:
+        pairs: (generated note, reference note) pairs
+
+    Returns:
+        Similarity per pair, None if the embedding pass failed
+    """
+    return await _get_matcher().score_pairs(pairs)
@@ -0,0 +1,137 @@
+"""
+Near-Duplicate Collapse Module
+
+Clusters near-duplicate generated comments within the same file so that only
+one representative per cluster needs to be semantically judged.
+"""
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import re
+
+from evaluator_runner.core.match_location import normalize_path
+
+DEFAULT_DEDUP_SIMILARITY_THRESHOLD = 0.8
+DEFAULT_MINHASH_PERMUTATIONS = 64
+DEFAULT_SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def normalize_comment_text(text: Optional[str]) -> str:
+    """
+    Normalize comment text for near-duplicate detection.
+
+    Lowercases, strips markdown/punctuation noise and collapses whitespace.
+
+    Args:
+        text: Original comment text
+
+    Returns:
+        Normalized text, empty string for null values
+    """
+    if not text:
+        return ""
+    text = text.lower()
+    text = re.sub(r"[`*_#>\[\](){}\"',.;:!?]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def _shingles(normalized_text: str, size: int = DEFAULT_SHINGLE_SIZE) -> Set[str]:
+    """Build word-level shingles from normalized text"""
+    tokens = normalized_text.split()
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _stable_hash(value: str) -> int:
+    """Process-independent 32-bit hash of a string"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "big")
+
+class MinHasher:
+    """MinHash signature builder for estimating Jaccard similarity"""
+
+    def __init__(self, num_permutations: int = DEFAULT_MINHASH_PERMUTATIONS, seed: int = 1):
+        self.num_permutations = num_permutations
+        self._coefficients = []
+        for i in range(num_permutations):
+            a = _stable_hash(f"a-{seed}-{i}") | 1
+            b = _stable_hash(f"b-{seed}-{i}")
+            self._coefficients.append((a, b))
+
+    def signature(self, shingles: Set[str]) -> List[int]:
+        """Compute MinHash signature for a set of shingles"""
+        if not shingles:
+            return [_MAX_HASH] * self.num_permutations
+        hashes = [_stable_hash(s) for s in shingles]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._coefficients
+        ]
+
+    @staticmethod
+    def similarity(sig1: List[int], sig2: List[int]) -> float:
+        """Estimate Jaccard similarity from two signatures"""
+        if not sig1 or len(sig1) != len(sig2):
+            return 0.0
+        return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+def cluster_generated_comments(
+        generated_comments: List[Dict[str, Any]],
+        similarity_threshold: float = DEFAULT_DEDUP_SIMILARITY_THRESHOLD,
+        num_permutations: int = DEFAULT_MINHASH_PERMUTATIONS
+) -> Dict[int, int]:
+    """
+    Cluster near-duplicate generated comments within the same file.
+
+    Comments are first grouped by exact normalized-text hash, then merged
+    into an earlier cluster when their MinHash similarity to that cluster's
+    representative reaches the threshold. The representative of a cluster
+    is always its earliest member, so processing order is preserved.
+
+    Args:
+        generated_comments: List of generated comments
+        similarity_threshold: Minimum estimated Jaccard similarity (0-1]
+        num_permutations: Number of MinHash permutations
+
+    Returns:
+        Mapping from comment position to the position of its representative
+    """
+    hasher = MinHasher(num_permutations=num_permutations)
+    representatives: Dict[str, List[int]] = {}
+    exact_index: Dict[tuple, int] = {}
+    signatures: Dict[int, List[int]] = {}
+    cluster_of: Dict[int, int] = {}
+
+    for pos, comment in enumerate(generated_comments):
+        if not isinstance(comment, dict) or not comment.get("note"):
+            continue
+
+        path = normalize_path(comment.get("path", ""))
+        normalized = normalize_comment_text(comment.get("note"))
+        text_key = (path, hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest())
+
+        if text_key in exact_index:
+            cluster_of[pos] = exact_index[text_key]
+            continue
+
+        signature = hasher.signature(_shingles(normalized))
+        representative = pos
+        for candidate in representatives.get(path, []):
+            if MinHasher.similarity(signature, signatures[candidate]) >= similarity_threshold:
+                representative = candidate
+                break
+
+        if representative == pos:
+            representatives.setdefault(path, []).append(pos)
+            signatures[pos] = signature
+
+        exact_index[text_key] = representative
+        cluster_of[pos] = representative
+
+    return cluster_of
+
+__all__ = [
+    'normalize_comment_text',
+    'MinHasher',
+    'cluster_generated_comments',
+    'DEFAULT_DEDUP_SIMILARITY_THRESHOLD'
+]
@@ -1,10 +1,11 @@
 """
 Embedding Semantic Matching Module
 """
-import os
 from pathlib import Path
 from dotenv import load_dotenv
 from evaluator_runner.core.match_base import BaseSemanticMatcher
+from evaluator_runner.core.endpoint_pool import load_endpoints
+from evaluator_runner.core.hedging import load_hedging
 
 # Load .env from the correct path
 env_path = Path(__file__).parent.parent / 'utils' / '.env'
@@ -14,11 +15,8 @@ class EmbeddingMatcher(BaseSemanticMatcher):
     """Embedding-based semantic matcher"""
 
     def __init__(self):
-        super().__init__(
-            base_url=os.getenv('EMBEDDING_MODEL_URL'),
-            api_key=os.getenv('EMBEDDING_API_KEY'),
-            model=os.getenv('EMBEDDING_MODEL')
-        )
+        # EMBEDDING_ENDPOINTS, or the single EMBEDDING_MODEL_URL/EMBEDDING_API_KEY/EMBEDDING_MODEL endpoint
+        super().__init__(endpoints=load_endpoints('EMBEDDING'), hedging=load_hedging('EMBEDDING'))
 
 _matcher_instance = None
 
@@ -1,10 +1,11 @@
 """
 LLM Semantic Matching Module
 """
-import os
 from pathlib import Path
 from dotenv import load_dotenv
 from evaluator_runner.core.match_base import BaseSemanticMatcher
+from evaluator_runner.core.endpoint_pool import load_endpoints
+from evaluator_runner.core.hedging import load_hedging
 
 # Load .env from the correct path
 env_path = Path(__file__).parent.parent / 'utils' / '.env'
@@ -14,11 +15,8 @@ class LLMMatcher(BaseSemanticMatcher):
     """LLM-based semantic matcher"""
 
     def __init__(self):
-        super().__init__(
-            base_url=os.getenv('LLM_MODEL_URL'),
-            api_key=os.getenv('LLM_API_KEY'),
-            model=os.getenv('LLM_MODEL')
-        )
+        # LLM_ENDPOINTS, or the single LLM_MODEL_URL/LLM_API_KEY/LLM_MODEL endpoint
+        super().__init__(endpoints=load_endpoints('LLM'), hedging=load_hedging('LLM'))
 
 _matcher_instance = None
 
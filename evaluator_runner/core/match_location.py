@@ -1,4 +1,5 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+import heapq
 import logging
 
 """
@@ -173,6 +174,48 @@ def match_location(
 
     return LocationMatchResult(is_match=True)
 
+class LocationIndex:
+    """
+    Path-bucketed index over reference comment locations.
+
+    Narrows the references a generated comment has to be checked against to
+    those in the same file (plus references without a path), while keeping
+    the original reference order so greedy matching is unchanged.
+    """
+
+    def __init__(self, references: List[Dict[str, Any]]):
+        self.locations: List[CommentLocation] = []
+        self._by_path: Dict[str, List[int]] = {}
+        self._pathless: List[int] = []
+
+        for position, reference in enumerate(references):
+            location = extract_comment_location(reference, is_generated=False)
+            self.locations.append(location)
+            if location.path:
+                self._by_path.setdefault(location.path, []).append(position)
+            else:
+                self._pathless.append(position)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def candidates(self, generated_loc: CommentLocation) -> List[int]:
+        """
+        Get positions of references that may match the given location.
+
+        Args:
+            generated_loc: Generated comment location
+
+        Returns:
+            Reference positions in ascending (original) order
+        """
+        if not generated_loc.path:
+            return list(range(len(self.locations)))
+        same_path = self._by_path.get(generated_loc.path, [])
+        if not self._pathless:
+            return list(same_path)
+        return list(heapq.merge(same_path, self._pathless))
+
 # ============ 兼容性别名（保持向后兼容） ============
 def _normalize_path(path: str) -> str:
     """向后兼容的别名"""
@@ -14,13 +14,37 @@ SemanticMatchFunc = Callable[[str, str], Awaitable[Dict[str, Any]]]
 
 
 def get_semantic_matcher(matcher_type: SemanticMatcherType) -> SemanticMatchFunc:
-    """Get semantic matching function by type"""
+    """
+    Get semantic matching function by type.
+
+    For CASCADE this is the LLM judge of the pairs the embedding pass cannot
+    decide; the embedding pass itself runs per PR in the evaluator.
+    """
     matchers = {
         SemanticMatcherType.LLM: match_llm,
         SemanticMatcherType.EMBEDDING: match_embedding,
+        SemanticMatcherType.CASCADE: match_llm,
     }
 
     if matcher_type not in matchers:
         raise ValueError(f"Unknown semantic matcher type: {matcher_type}")
 
-    return matchers[matcher_type]
\ No newline at end of file
+    return matchers[matcher_type]
+
+
+def get_matcher_stats() -> Dict[str, Any]:
+    """
+    Endpoint and hedging statistics of the matchers used so far in this process.
+
+    Returns:
+        Matcher type value -> stats() of its matcher; matchers never used are omitted
+    """
+    # the modules, not their match functions imported above
+    from evaluator_runner.core import match_cascade, match_embedding, match_llm
+    stats = {}
+    for matcher_type, module in ((SemanticMatcherType.LLM, match_llm),
+                                 (SemanticMatcherType.EMBEDDING, match_embedding),
+                                 (SemanticMatcherType.CASCADE, match_cascade)):
+        if module._matcher_instance is not None:
+            stats[matcher_type.value] = module._matcher_instance.stats()
+    return stats
@@ -0,0 +1,305 @@
+"""
+Sampled Evaluation Module
+
+Estimates run-level metrics from a stratified random sample of PRs, with
+confidence intervals, instead of evaluating every PR.
+"""
+import logging
+import math
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from statistics import NormalDist, variance
+from typing import Any, Dict, List, Optional, Sequence
+
+from evaluator_runner.utils.config import EvaluatorConfig
+from evaluator_runner.core.matcher_factory import SemanticMatchFunc
+from evaluator_runner.core.streaming import stream_evaluations
+
+# metric -> (numerator, denominator) fields of a per-PR result
+SAMPLED_METRICS = {
+    "positive_match_rate": ("positive_match_nums", "total_generated_nums"),
+    "positive_recall_rate": ("positive_match_nums", "positive_expected_nums")
+}
+
+
+@dataclass
+class Estimate:
+    """Point estimate with a confidence interval"""
+    value: float
+    lower: float
+    upper: float
+
+    @property
+    def width(self) -> float:
+        return self.upper - self.lower
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "estimate": round(self.value, 4),
+            "lower": round(self.lower, 4),
+            "upper": round(self.upper, 4),
+            "width": round(self.width, 4)
+        }
+
+
+def build_strata(
+        prs: Sequence[Dict[str, Any]],
+        strata_keys: Sequence[str] = ("category", "project_main_language"),
+        min_stratum_size: int = 10
+) -> Dict[str, List[int]]:
+    """
+    Group PRs into strata by their pr_metadata values.
+
+    Cells with fewer than `min_stratum_size` PRs are merged on the leading
+    keys, e.g. (category, language) cells into their category, and whatever
+    is still too small ends up in one "*" stratum.
+
+    Returns:
+        Stratum name (values joined by " / ") -> indices into prs
+    """
+    strata = {}
+    leftovers = list(range(len(prs)))
+    for level in range(len(strata_keys), -1, -1):
+        cells = defaultdict(list)
+        for i in leftovers:
+            metadata = prs[i].get("pr_metadata") or {}
+            values = [str(metadata.get(key) or "unknown") for key in strata_keys[:level]]
+            cells[" / ".join(values + ["*"] * (len(strata_keys) - level))].append(i)
+        leftovers = []
+        for name, members in cells.items():
+            if len(members) >= min_stratum_size or level == 0:
+                strata[name] = members
+            else:
+                leftovers.extend(members)
+    return strata
+
+
+class StratifiedSample:
+    """
+    Stratified random sample of PRs and the metrics estimated from it.
+
+    A rate such as positive_match_rate is a ratio of totals over all PRs
+    (matches / generated comments), estimated with the stratified ratio
+    estimator; its confidence interval uses the linearized variance with the
+    finite population correction, so it shrinks to zero once every PR is
+    sampled. PRs whose evaluation failed are left out as missing.
+
+    Args:
+        prs: Evaluation inputs, as for stream_evaluations
+        strata_keys: pr_metadata keys defining the strata
+        min_stratum_size: Smallest stratum before cells are merged
+        seed: Random seed of the sample
+    """
+
+    def __init__(
+            self,
+            prs: Sequence[Dict[str, Any]],
+            strata_keys: Sequence[str] = ("category", "project_main_language"),
+            min_stratum_size: int = 10,
+            seed: int = 0
+    ):
+        self.prs = list(prs)
+        self.strata = build_strata(self.prs, strata_keys, min_stratum_size)
+        rng = random.Random(seed)
+        self._unsampled = {}
+        for name, members in self.strata.items():
+            members = list(members)
+            rng.shuffle(members)
+            self._unsampled[name] = members
+        self._stratum_of = {
+            self.prs[i].get("github_pr_url"): name for name, members in self.strata.items() for i in members
+        }
+        self.results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in self.strata}
+        self.failed = 0
+
+    @property
+    def sampled(self) -> int:
+        return sum(len(members) for members in self.strata.values()) - self.remaining
+
+    @property
+    def remaining(self) -> int:
+        return sum(len(members) for members in self._unsampled.values())
+
+    def _take(self, name: str) -> Dict[str, Any]:
+        return self.prs[self._unsampled[name].pop()]
+
+    def draw_initial(self, size: int) -> List[Dict[str, Any]]:
+        """
+        Draw the first PRs: two per stratum (enough for a variance), then
+        the rest of `size` proportionally to stratum size.
+        """
+        batch = []
+        for name in self.strata:
+            for _ in range(min(2, len(self._unsampled[name]))):
+                batch.append(self._take(name))
+        population = len(self.prs)
+        for name, members in self.strata.items():
+            share = round(size * len(members) / population) - (len(members) - len(self._unsampled[name]))
+            for _ in range(min(max(share, 0), len(self._unsampled[name]))):
+                batch.append(self._take(name))
+        return batch
+
+    def draw(self, size: int) -> List[Dict[str, Any]]:
+        """
+        Draw more PRs where they reduce the variance most (Neyman allocation
+        by the observed spread of the strata).
+        """
+        spreads = {name: self._spread(name) for name in self.strata}
+        if not any(spreads.values()):
+            spreads = {name: 1.0 for name in self.strata}
+        planned = {name: len(self.results[name]) for name in self.strata}
+        batch = []
+        for _ in range(min(size, self.remaining)):
+            def gain(name):
+                n = max(planned[name], 1)
+                return (len(self.strata[name]) * spreads[name]) ** 2 / (n * (n + 1))
+            open_strata = [name for name in self.strata if self._unsampled[name]]
+            name = max(open_strata, key=gain)
+            planned[name] += 1
+            batch.append(self._take(name))
+        return batch
+
+    def add(self, result: Dict[str, Any]):
+        """Add the evaluation result of a drawn PR"""
+        name = self._stratum_of.get(result.get("github_pr_url"))
+        if name is None:
+            return
+        if "error" in result:
+            self.failed += 1
+            return
+        self.results[name].append(result)
+
+    def _residuals(self, results: List[Dict[str, Any]], metric: str, ratio: float) -> List[float]:
+        numerator, denominator = SAMPLED_METRICS[metric]
+        return [r.get(numerator, 0) - ratio * r.get(denominator, 0) for r in results]
+
+    def _spread(self, name: str) -> float:
+        """Largest standard deviation of the metric residuals in one stratum"""
+        results = self.results[name]
+        if len(results) < 2:
+            return 0.0
+        return max(
+            math.sqrt(variance(self._residuals(results, metric, self.estimate(metric).value)))
+            for metric in SAMPLED_METRICS
+        )
+
+    def estimate(self, metric: str, confidence: float = 0.95) -> Estimate:
+        """
+        Estimate a run-level rate from the sample.
+
+        Args:
+            metric: positive_match_rate or positive_recall_rate
+            confidence: Confidence level of the interval
+        """
+        numerator, denominator = SAMPLED_METRICS[metric]
+        total_y = total_x = 0.0
+        for name, results in self.results.items():
+            if results:
+                weight = len(self.strata[name]) / len(results)
+                total_y += weight * sum(r.get(numerator, 0) for r in results)
+                total_x += weight * sum(r.get(denominator, 0) for r in results)
+        if total_x == 0:
+            return Estimate(0.0, 0.0, 1.0)
+        ratio = total_y / total_x
+
+        all_results = [r for results in self.results.values() for r in results]
+        pooled = self._residuals(all_results, metric, ratio)
+        pooled_variance = variance(pooled) if len(pooled) >= 2 else 0.0
+        var = 0.0
+        for name, results in self.results.items():
+            n, size = len(results), len(self.strata[name])
+            if n == 0:
+                continue
+            residuals = self._residuals(results, metric, ratio)
+            stratum_variance = variance(residuals) if n >= 2 else pooled_variance
+            var += size ** 2 * (1 - n / size) * stratum_variance / n
+        half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(max(var, 0.0)) / total_x
+        return Estimate(ratio, max(ratio - half_width, 0.0), min(ratio + half_width, 1.0))
+
+    def report(self, confidence: float = 0.95) -> Dict[str, Any]:
+        """Estimates, sample sizes per stratum and the evaluated PR results"""
+        report = {
+            "population_prs": len(self.prs),
+            "sampled_prs": self.sampled,
+            "sample_fraction": round(self.sampled / len(self.prs), 4) if self.prs else 0.0,
+            "failed_prs": self.failed,
+            "confidence": confidence
+        }
+        for metric in SAMPLED_METRICS:
+            report[metric] = self.estimate(metric, confidence).to_dict()
+        report["strata"] = [
+            {"stratum": name, "population": len(members), "sampled": len(members) - len(self._unsampled[name])}
+            for name, members in sorted(self.strata.items())
+        ]
+        report["details"] = sorted(
+            (r for results in self.results.values() for r in results),
+            key=lambda r: r.get("github_pr_url", "")
+        )
+        return report
+
+
+async def evaluate_sampled(
+        prs: Sequence[Dict[str, Any]],
+        config: EvaluatorConfig = None,
+        initial_size: Optional[int] = None,
+        target_width: Optional[float] = None,
+        batch_size: int = 10,
+        max_prs: Optional[int] = None,
+        confidence: float = 0.95,
+        strata_keys: Sequence[str] = ("category", "project_main_language"),
+        min_stratum_size: int = 10,
+        concurrency: int = 4,
+        seed: int = 0,
+        semantic_match_func: Optional[SemanticMatchFunc] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate a stratified random sample of PRs and estimate the run-level
+    positive_match_rate and positive_recall_rate with confidence intervals.
+
+    Without `target_width` only the initial sample is evaluated. With it,
+    batches of `batch_size` PRs are added until both intervals are at most
+    `target_width` wide, `max_prs` are sampled, or every PR is evaluated.
+
+    Args:
+        prs: Evaluation inputs, as for stream_evaluations; pr_metadata holds
+            the stratum values
+        config: Evaluator configuration
+        initial_size: PRs in the first sample, default 10% of the PRs
+            (at least two per stratum are always drawn)
+        target_width: Interval width to reach, e.g. 0.05
+        batch_size: PRs added per round while the target is not reached
+        max_prs: Upper bound on the sampled PRs
+        confidence: Confidence level of the intervals
+        strata_keys: pr_metadata keys defining the strata
+        min_stratum_size: Smallest stratum before cells are merged
+        concurrency: PRs evaluated at the same time
+        seed: Random seed of the sample
+        semantic_match_func: Optional replacement of the configured matcher
+
+    Returns:
+        StratifiedSample.report() plus target_width and target_reached
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be in (0, 1)")
+    sample = StratifiedSample(prs, strata_keys, min_stratum_size, seed)
+    if max_prs is None:
+        max_prs = len(sample.prs)
+
+    def _widest() -> float:
+        return max(sample.estimate(metric, confidence).width for metric in SAMPLED_METRICS)
+
+    batch = sample.draw_initial(initial_size if initial_size is not None else math.ceil(len(sample.prs) / 10))
+    while batch:
+        async for event in stream_evaluations(batch, config, concurrency, semantic_match_func):
+            if event["event"] == "result":
+                sample.add(event["result"])
+        logging.info(f"Sampled {sample.sampled}/{len(sample.prs)} PRs, widest interval {_widest():.4f}")
+        if target_width is None or _widest() <= target_width:
+            break
+        batch = sample.draw(min(batch_size, max_prs - sample.sampled))
+
+    report = sample.report(confidence)
+    report["target_width"] = target_width
+    report["target_reached"] = target_width is not None and _widest() <= target_width
+    return report
@@ -0,0 +1,97 @@
+"""
+Scoreboard Module
+
+Aggregates per-PR evaluation results into run-level metrics.
+"""
+from typing import Any, Dict, List, Optional
+
+from evaluator_runner.core.evaluator import _calculate_rate
+
+
+class Scoreboard:
+    """
+    Running totals over per-PR results of get_evaluator_ans_from_json.
+
+    Results may be added in any order; the summary only depends on the set of
+    results added, so incremental, streamed and merged runs report the same
+    metrics as a single batch run.
+    """
+
+    def __init__(self):
+        self.total_files = 0
+        self.results: List[Dict[str, Any]] = []
+        self.total_generated = 0
+        self.total_reference = 0
+        self.total_line_matches = 0
+        self.total_semantic_matches = 0
+        self.total_negative = 0
+        self.total_negative_matches = 0
+
+    def add(self, result: Optional[Dict[str, Any]]):
+        """
+        Add one PR result.
+
+        Args:
+            result: Evaluation result, or None for a PR that could not be evaluated
+                (it still counts towards total_files)
+        """
+        self.total_files += 1
+        if result is None or result.get("skipped") or "error" in result:
+            return
+        self.results.append(result)
+        self.total_generated += result.get("total_generated_nums", 0)
+        self.total_reference += result.get("positive_expected_nums", 0)
+        self.total_line_matches += result.get("positive_line_match_nums", 0)
+        self.total_semantic_matches += result.get("positive_match_nums", 0)
+        self.total_negative += result.get("negative_expected_nums", 0)
+        self.total_negative_matches += result.get("negative_match_nums", 0)
+
+    def add_summary(self, summary: Dict[str, Any]):
+        """
+        Add the results of another run, e.g. one shard of a sharded run.
+
+        Args:
+            summary: Output of summary() including details
+        """
+        details = summary.get("details", [])
+        for result in details:
+            self.add(result)
+        for _ in range(summary.get("total_files", len(details)) - len(details)):
+            self.add(None)
+
+    def summary(self, include_details: bool = True) -> Dict[str, Any]:
+        """
+        Run-level metrics over the results added so far.
+
+        Args:
+            include_details: Whether to include the per-PR results, sorted by PR URL
+        """
+        summary = {
+            "total_files": self.total_files,
+            "evaluated_files": len(self.results),
+            "total_generated_comments": self.total_generated,
+            "total_reference_comments": self.total_reference,
+            "total_line_matches": self.total_line_matches,
+            "total_semantic_matches": self.total_semantic_matches,
+            "overall_line_match_rate": round(_calculate_rate(self.total_line_matches, self.total_generated), 4),
+            "overall_semantic_match_rate": round(_calculate_rate(self.total_semantic_matches, self.total_generated), 4),
+            "overall_line_recall": round(_calculate_rate(self.total_line_matches, self.total_reference), 4),
+            "overall_semantic_recall": round(_calculate_rate(self.total_semantic_matches, self.total_reference), 4),
+            "total_negative_comments": self.total_negative,
+            "total_negative_matches": self.total_negative_matches,
+            "overall_false_positive_rate": round(
+                _calculate_rate(self.total_negative_matches, self.total_generated), 4
+            ),
+        }
+        if include_details:
+            summary["details"] = sorted(self.results, key=lambda r: r.get("github_pr_url", ""))
+        return summary
+
+    def format_line(self) -> str:
+        """One-line running scoreboard."""
+        s = self.summary(include_details=False)
+        return (f"[{s['evaluated_files']}/{s['total_files']}] "
+                f"match {s['overall_semantic_match_rate']:.2%} "
+                f"recall {s['overall_semantic_recall']:.2%} "
+                f"line match {s['overall_line_match_rate']:.2%} "
+                f"FPR {s['overall_false_positive_rate']:.2%}")
@@ -0,0 +1,104 @@
+"""
+Streaming Evaluation Module
+
+Evaluates a sequence of PRs and yields events as match records and PR
+results resolve, with running aggregate metrics.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+
+from evaluator_runner.utils.config import EvaluatorConfig
+from evaluator_runner.core.evaluator import get_evaluator_ans_from_json
+from evaluator_runner.core.matcher_factory import SemanticMatchFunc
+from evaluator_runner.core.scoreboard import Scoreboard
+
+
+async def stream_evaluations(
+        prs: Iterable[Dict[str, Any]],
+        config: EvaluatorConfig = None,
+        concurrency: int = 1,
+        semantic_match_func: Optional[SemanticMatchFunc] = None,
+        scoreboard: Optional[Scoreboard] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Evaluate PRs, yielding events as they happen.
+
+    Events:
+        {"event": "record", "github_pr_url": ..., "record": {...}}
+            One generated comment resolved; the record is the match_details entry
+        {"event": "result", "github_pr_url": ..., "result": {...}, "scoreboard": {...}}
+            One PR finished; scoreboard holds the running Scoreboard metrics
+        {"event": "summary", "summary": {...}}
+            All PRs finished; the Scoreboard summary with details
+
+    The consumer may stop at any event, e.g. once the running metrics are
+    conclusive. Closing the generator (`aclose()`, or cancelling the task that
+    iterates it) cancels the PRs still being evaluated together with their
+    in-flight semantic requests.
+
+    Args:
+        prs: Keyword arguments of get_evaluator_ans_from_json per PR
+            (github_pr_url, generated_comments, good_comments and optionally
+            pr_metadata and bad_comments); consumed lazily
+        config: Evaluator configuration shared by all PRs
+        concurrency: Number of PRs evaluated at the same time
+        semantic_match_func: Optional replacement of the configured matcher
+        scoreboard: Optional scoreboard to accumulate into, e.g. one resumed
+            from an earlier run
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if scoreboard is None:
+        scoreboard = Scoreboard()
+
+    events: "asyncio.Queue" = asyncio.Queue()
+    pending = iter(prs)
+    tasks: Set[asyncio.Task] = set()
+    active = 0
+
+    async def _evaluate(pr: Dict[str, Any]):
+        pr_url = pr.get("github_pr_url", "")
+
+        def _on_record(record: Dict[str, Any]):
+            events.put_nowait({"event": "record", "github_pr_url": pr_url, "record": record})
+
+        try:
+            result = await get_evaluator_ans_from_json(
+                config=config, semantic_match_func=semantic_match_func, on_record=_on_record, **pr
+            )
+        except Exception as e:
+            result = {"github_pr_url": pr_url, "error": str(e)}
+        result.setdefault("github_pr_url", pr_url)
+        events.put_nowait({"event": "result", "github_pr_url": pr_url, "result": result})
+
+    def _start_next() -> bool:
+        nonlocal active
+        for pr in pending:
+            task = asyncio.ensure_future(_evaluate(pr))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            active += 1
+            return True
+        return False
+
+    try:
+        while active < concurrency and _start_next():
+            pass
+        while active:
+            event = await events.get()
+            if event["event"] == "result":
+                active -= 1
+                scoreboard.add(event["result"])
+                event["scoreboard"] = scoreboard.summary(include_details=False)
+                yield event
+                # the next PR starts once the consumer has taken this result,
+                # so a consumer that stops here starts no further work
+                _start_next()
+                continue
+            yield event
+        yield {"event": "summary", "summary": scoreboard.summary()}
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,94 @@
+"""
+Verdict Cache Module
+
+Keeps semantic verdicts in memory so that long-running evaluations (e.g. the
+evaluation service) do not judge the same comment pair twice.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from evaluator_runner.core.matcher_factory import SemanticMatchFunc
+from evaluator_runner.utils.config import SemanticMatcherType
+
+VerdictKey = Tuple[str, str, str]
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of semantic verdicts.
+
+    Verdicts are keyed by matcher type and the two comment texts. Concurrent
+    requests for a pair that is being judged wait for that call instead of
+    issuing their own, and judge it themselves if that call fails. Verdicts
+    of failed calls ("ERROR: ..." reasons) are not cached, so the pair is
+    judged again next time.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[VerdictKey, Dict[str, Any]]" = OrderedDict()
+        self._pending: Dict[VerdictKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.joined
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "hit_rate": round((self.hits + self.joined) / lookups, 4) if lookups else 0.0
+        }
+
+    def _store(self, key: VerdictKey, verdict: Dict[str, Any]):
+        if str(verdict.get("reason", "")).startswith("ERROR:"):
+            return
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def wrap(self, matcher_type: SemanticMatcherType, match_func: SemanticMatchFunc) -> SemanticMatchFunc:
+        """
+        Wrap a semantic match function so that its verdicts go through the cache.
+
+        Args:
+            matcher_type: Matcher the verdicts belong to, part of the cache key
+            match_func: Function returned by get_semantic_matcher
+        """
+        async def _match(comment1: str, comment2: str) -> Dict[str, Any]:
+            key = (matcher_type.value, comment1, comment2)
+            while key in self._pending:
+                self.joined += 1
+                pending = self._pending[key]
+                # waiting must not cancel the call of another request
+                await asyncio.wait([pending])
+                if not pending.cancelled():
+                    return pending.result()
+                # that call failed or was cancelled, judge the pair here
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            try:
+                verdict = await match_func(comment1, comment2)
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                del self._pending[key]
+            self._store(key, verdict)
+            future.set_result(verdict)
+            return verdict
+
+        return _match
@@ -4,18 +4,23 @@ Example: Custom Directory Evaluation
 A simple and configurable evaluation script for batch processing.
 """
 
+import argparse
 import asyncio
 import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from evaluator_runner import (
-    get_evaluator_ans_from_json,
+    stream_evaluations,
+    evaluate_sampled,
     load_generated_comments_from_file,
     EvaluatorConfig,
+    Scoreboard,
     FilterConfig,
     SemanticMatcherType,
 )
+from evaluator_runner.core.matcher_factory import get_matcher_stats
+from evaluator_runner.utils.sharding import parse_shard, shard_of, assign_shards, shard_path, Shard
 
 # ============================================================================
 # Configuration - Modify these settings as needed
@@ -33,6 +38,21 @@ FILE_PATTERN = "*.txt"
 # Reference data file (positive samples)
 REFERENCE_DATA_FILE = "../dataset/positive_samples.json"
 
+# Negative reference data file (known-bad comments), set to None to skip false-positive scoring
+NEGATIVE_DATA_FILE = "../dataset/negative_samples.json"
+
+# Shard to evaluate, e.g. "2/4" (1-based), None to evaluate all files (--shard overrides it)
+SHARD = None
+
+# Balance shards by change_line_count instead of plain PR URL hashing (--weighted overrides it)
+SHARD_BY_CHANGE_SIZE = False
+
+# Approximate evaluation: number of PRs in the initial stratified sample, None to evaluate all PRs (--sample overrides it)
+SAMPLE_SIZE = None
+
+# Approximate evaluation: keep sampling until both confidence intervals are at most this wide, e.g. 0.05 (--target-width overrides it)
+TARGET_INTERVAL_WIDTH = None
+
 # ============================================================================
 # Evaluation Configuration
 # ============================================================================
@@ -43,9 +63,15 @@ LINE_DISTANCE_THRESHOLD = 1
 # Enable semantic matching (True/False)
 ENABLE_SEMANTIC_MATCH = True
 
-# TODO Semantic matcher type: "llm" or "embedding"
+# TODO Semantic matcher type: "llm", "embedding" or "cascade"
 SEMANTIC_MATCHER_TYPE = "llm"
 
+# Cascade matcher: embedding similarity at or above which a pair is accepted without the LLM
+CASCADE_ACCEPT_THRESHOLD = 0.9
+
+# Cascade matcher: embedding similarity below which a pair is rejected without the LLM
+CASCADE_REJECT_THRESHOLD = 0.5
+
 # ============================================================================
 # Filter Configuration (Optional) - Set to None to disable filtering
 # ============================================================================
@@ -131,8 +157,8 @@ def build_config() -> EvaluatorConfig:
         )
     
     matcher_type = (
-        SemanticMatcherType.EMBEDDING
-        if SEMANTIC_MATCHER_TYPE == "embedding"
+        SemanticMatcherType(SEMANTIC_MATCHER_TYPE)
+        if SEMANTIC_MATCHER_TYPE in ("embedding", "cascade")
         else SemanticMatcherType.LLM
     )
     
@@ -141,6 +167,8 @@ def build_config() -> EvaluatorConfig:
         semantic_matcher_type=matcher_type,
         enable_semantic_match=ENABLE_SEMANTIC_MATCH,
         filter_config=filter_config,
+        cascade_accept_threshold=CASCADE_ACCEPT_THRESHOLD,
+        cascade_reject_threshold=CASCADE_REJECT_THRESHOLD,
     )
 
 
@@ -148,9 +176,50 @@ def build_config() -> EvaluatorConfig:
 # Main Evaluation Logic
 # ============================================================================
 
-async def evaluate_directory() -> Dict[str, Any]:
+def select_shard_files(
+    files: List[Path],
+    reference_data: List[Dict[str, Any]],
+    shard: Shard,
+    weighted: bool
+) -> List[Path]:
+    """
+    Keep the comment files of one shard.
+
+    Files are assigned by the PR URL they belong to, with the same assignment
+    as `claude-code-demo/main.py --shard`; files without a known PR URL are
+    assigned by file name so that every file lands in exactly one shard.
+    """
+    urls = [item.get("githubPrUrl", "") for item in reference_data]
+    weights = [item.get("change_line_count", 0) for item in reference_data] if weighted else None
+    assignment = assign_shards(urls, shard[1], weights)
+    selected = []
+    for file_path in files:
+        pr_url = infer_pr_url_from_filename(file_path.name, reference_data)
+        if pr_url in assignment:
+            file_shard = assignment[pr_url]
+        else:
+            file_shard = shard_of(file_path.name, shard[1])
+        if file_shard == shard[0]:
+            selected.append(file_path)
+    return selected
+
+
+async def evaluate_directory(
+    shard: Optional[Shard] = None,
+    weighted: bool = False,
+    sample_size: Optional[int] = None,
+    target_width: Optional[float] = None,
+    seed: int = 0
+) -> Dict[str, Any]:
     """
     Evaluate all comment files in the input directory.
+
+    Args:
+        shard: Optional (i, N) to evaluate only the files of shard i
+        weighted: Balance shards by change_line_count
+        sample_size: Evaluate only a stratified sample of this many PRs
+        target_width: Grow the sample until the confidence intervals are this wide
+        seed: Random seed of the sample
     """
     input_path = Path(INPUT_DIR)
     
@@ -163,12 +232,23 @@ async def evaluate_directory() -> Dict[str, Any]:
     
     reference_data = load_reference_data(REFERENCE_DATA_FILE)
     print(f"Loaded {len(reference_data)} reference PRs")
+
+    negative_data = None
+    if NEGATIVE_DATA_FILE:
+        if not Path(NEGATIVE_DATA_FILE).exists():
+            raise FileNotFoundError(f"Negative data file not found: {NEGATIVE_DATA_FILE}")
+        negative_data = load_reference_data(NEGATIVE_DATA_FILE)
+        print(f"Loaded {len(negative_data)} negative reference PRs")
     
     # Find all comment files
     files = list(input_path.glob(FILE_PATTERN))
     if not files:
         raise FileNotFoundError(f"No files matching '{FILE_PATTERN}' in {INPUT_DIR}")
     
+    if shard is not None:
+        files = select_shard_files(files, reference_data, shard, weighted)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(files)} files")
+    
     print(f"Found {len(files)} files to evaluate")
     
     # Build configuration
@@ -177,119 +257,147 @@ async def evaluate_directory() -> Dict[str, Any]:
           f"semantic_match={ENABLE_SEMANTIC_MATCH}")
     
     # Evaluate each file
-    results = []
-    total_generated = 0
-    total_reference = 0
-    total_line_matches = 0
-    total_semantic_matches = 0
+    scoreboard = Scoreboard()
+
+    def load_prs():
+        """Yield the evaluation inputs of the files, counting skipped files on the scoreboard"""
+        for file_path in files:
+            print(f"\nProcessing: {file_path.name}")
+            
+            # Infer PR URL
+            pr_url = infer_pr_url_from_filename(file_path.name, reference_data)
+            if not pr_url:
+                print(f"  Skipped: Cannot match PR URL")
+                scoreboard.add(None)
+                continue
+            
+            # Find reference comments
+            ref_item = find_reference_by_url(pr_url, reference_data)
+            if not ref_item:
+                print(f"  Skipped: No reference data found")
+                scoreboard.add(None)
+                continue
+            
+            reference_comments = ref_item.get("comments", [])
+
+            negative_comments = None
+            if negative_data is not None:
+                negative_item = find_reference_by_url(pr_url, negative_data)
+                negative_comments = negative_item.get("comments", []) if negative_item else []
+            
+            # Load generated comments
+            try:
+                generated_comments = load_generated_comments_from_file(str(file_path))
+            except Exception as e:
+                print(f"  Skipped: Failed to parse file ({e})")
+                scoreboard.add(None)
+                continue
+            
+            if not generated_comments:
+                print(f"  Skipped: No valid comments found")
+                scoreboard.add(None)
+                continue
+            
+            yield {
+                "github_pr_url": pr_url,
+                "generated_comments": generated_comments,
+                "good_comments": reference_comments,
+                "pr_metadata": {
+                    "category": ref_item.get("category"),
+                    "project_main_language": ref_item.get("project_main_language"),
+                },
+                "bad_comments": negative_comments,
+            }
     
-    for file_path in files:
-        print(f"\nProcessing: {file_path.name}")
-        
-        # Infer PR URL
-        pr_url = infer_pr_url_from_filename(file_path.name, reference_data)
-        if not pr_url:
-            print(f"  Skipped: Cannot match PR URL")
-            continue
-        
-        # Find reference comments
-        ref_item = find_reference_by_url(pr_url, reference_data)
-        if not ref_item:
-            print(f"  Skipped: No reference data found")
-            continue
-        
-        reference_comments = ref_item.get("comments", [])
-        
-        # Load generated comments
-        try:
-            generated_comments = load_generated_comments_from_file(str(file_path))
-        except Exception as e:
-            print(f"  Skipped: Failed to parse file ({e})")
+    if sample_size is not None or target_width is not None:
+        print("Approximate evaluation: "
+              f"sample={sample_size if sample_size is not None else 'default'}, target_width={target_width}")
+        return await evaluate_sampled(
+            list(load_prs()), config, initial_size=sample_size, target_width=target_width, seed=seed
+        )
+    
+    # Run evaluation, printing each PR as it completes
+    summary = scoreboard.summary()
+    async for event in stream_evaluations(load_prs(), config, scoreboard=scoreboard):
+        if event["event"] == "summary":
+            summary = event["summary"]
             continue
-        
-        if not generated_comments:
-            print(f"  Skipped: No valid comments found")
+        if event["event"] != "result":
             continue
-        
-        # Run evaluation
-        pr_metadata = {
-            "category": ref_item.get("category"),
-            "project_main_language": ref_item.get("project_main_language"),
-        }
-        
-        result = await get_evaluator_ans_from_json(
-            github_pr_url=pr_url,
-            generated_comments=generated_comments,
-            good_comments=reference_comments,
-            config=config,
-            pr_metadata=pr_metadata,
-        )
-        
+        result = event["result"]
         if result.get("skipped"):
             print(f"  Skipped: {result.get('skip_reason')}")
             continue
         
-        results.append(result)
-        
-        # Accumulate statistics
-        total_generated += result.get("total_generated_nums", 0)
-        total_reference += result.get("positive_expected_nums", 0)
-        total_line_matches += result.get("positive_line_match_nums", 0)
-        total_semantic_matches += result.get("positive_match_nums", 0)
-        
         print(f"  Generated: {result.get('total_generated_nums')}, "
               f"Reference: {result.get('positive_expected_nums')}, "
               f"Line Match: {result.get('positive_line_match_nums')}, "
-              f"Semantic Match: {result.get('positive_match_nums')}")
-    
-    # Calculate overall metrics
-    overall_line_match_rate = (
-        total_line_matches / total_generated if total_generated > 0 else 0
-    )
-    overall_semantic_match_rate = (
-        total_semantic_matches / total_generated if total_generated > 0 else 0
-    )
-    overall_line_recall = (
-        total_line_matches / total_reference if total_reference > 0 else 0
-    )
-    overall_semantic_recall = (
-        total_semantic_matches / total_reference if total_reference > 0 else 0
-    )
-    
-    summary = {
-        "total_files": len(files),
-        "evaluated_files": len(results),
-        "total_generated_comments": total_generated,
-        "total_reference_comments": total_reference,
-        "total_line_matches": total_line_matches,
-        "total_semantic_matches": total_semantic_matches,
-        "overall_line_match_rate": round(overall_line_match_rate, 4),
-        "overall_semantic_match_rate": round(overall_semantic_match_rate, 4),
-        "overall_line_recall": round(overall_line_recall, 4),
-        "overall_semantic_recall": round(overall_semantic_recall, 4),
-        "details": results,
-    }
+              f"Semantic Match: {result.get('positive_match_nums')}, "
+              f"Negative Match: {result.get('negative_match_nums', 0)}")
+        print(f"  {scoreboard.format_line()}")
     
     return summary
 
 
+def print_matcher_stats(matcher_stats: Dict[str, Any]):
+    """Print request, hedging and latency statistics of the semantic matchers."""
+    for matcher_type, stats in matcher_stats.items():
+        requests = sum(endpoint["requests"] for endpoint in stats["endpoints"])
+        errors = sum(endpoint["errors"] for endpoint in stats["endpoints"])
+        print(f"Matcher {matcher_type}: {requests} requests, {errors} errors "
+              f"over {len(stats['endpoints'])} endpoint(s)")
+        hedging = stats.get("hedging")
+        if hedging:
+            print(f"  Hedge Rate: {hedging['hedge_rate']:.2%} ({hedging['hedged']}/{hedging['calls']} calls, "
+                  f"{hedging['hedge_wins']} won by the hedge)")
+            print(f"  Extra Cost: {hedging['extra_requests']} requests, {hedging['extra_prompt_tokens']} prompt tokens")
+            print(f"  Call Latency: p50 {hedging['latency_p50']}s, p99 {hedging['latency_p99']}s")
+
+
 async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Evaluate a directory of generated comments")
+    parser.add_argument("--shard", default=SHARD, help="evaluate only shard i of N, e.g. 2/4")
+    parser.add_argument("--weighted", action="store_true", default=SHARD_BY_CHANGE_SIZE,
+                        help="balance shards by change_line_count")
+    parser.add_argument("--sample", type=int, default=SAMPLE_SIZE,
+                        help="evaluate a stratified sample of this many PRs and estimate the metrics")
+    parser.add_argument("--target-width", type=float, default=TARGET_INTERVAL_WIDTH,
+                        help="keep sampling until the confidence intervals are at most this wide")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the sample")
+    args = parser.parse_args()
+    shard = parse_shard(args.shard) if args.shard else None
+    output_file = shard_path(OUTPUT_FILE, shard) if shard is not None else OUTPUT_FILE
+
     print("=" * 60)
     print("Custom Directory Evaluation")
     print("=" * 60)
     print(f"Input Directory: {INPUT_DIR}")
-    print(f"Output File: {OUTPUT_FILE}")
+    print(f"Output File: {output_file}")
     print(f"File Pattern: {FILE_PATTERN}")
     print()
     
     try:
-        result = await evaluate_directory()
+        result = await evaluate_directory(shard, args.weighted, args.sample, args.target_width, args.seed)
+        result["matcher_stats"] = get_matcher_stats()
         
         # Save results
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
         
+        if "sampled_prs" in result:
+            print("\n" + "=" * 60)
+            print("Approximate Evaluation Summary")
+            print("=" * 60)
+            print(f"PRs Sampled: {result['sampled_prs']}/{result['population_prs']}")
+            for label, key in (("Semantic Match Rate", "positive_match_rate"), ("Semantic Recall", "positive_recall_rate")):
+                estimate = result[key]
+                print(f"{label}: {estimate['estimate']:.2%} "
+                      f"({result['confidence']:.0%} CI {estimate['lower']:.2%} - {estimate['upper']:.2%})")
+            print_matcher_stats(result["matcher_stats"])
+            print(f"\nResults saved to: {output_file}")
+            return
+        
         # Print summary
         print("\n" + "=" * 60)
         print("Evaluation Summary")
@@ -301,7 +409,10 @@ async def main():
         print(f"Semantic Match Rate: {result['overall_semantic_match_rate']:.2%}")
         print(f"Line Recall: {result['overall_line_recall']:.2%}")
         print(f"Semantic Recall: {result['overall_semantic_recall']:.2%}")
-        print(f"\nResults saved to: {OUTPUT_FILE}")
+        if NEGATIVE_DATA_FILE:
+            print(f"False Positive Rate: {result['overall_false_positive_rate']:.2%}")
+        print_matcher_stats(result["matcher_stats"])
+        print(f"\nResults saved to: {output_file}")
         
     except FileNotFoundError as e:
         print(f"Error: {e}")
@@ -0,0 +1,78 @@
+"""
+Merge Shard Results
+
+Combines the outputs of a sharded evaluation into one summary, identical to
+the summary of a single-node run over the same PRs.
+
+Usage:
+    python evaluator_runner/merge_shards.py -o results/evaluation_results.json \
+        results/evaluation_results.shard-*.json
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+from evaluator_runner.core.scoreboard import Scoreboard
+
+
+def load_shard_output(path: str) -> Dict[str, Any]:
+    """
+    Load one shard output as a summary.
+
+    Args:
+        path: Summary file (.json) written by example_test.py or
+            `main.py --evaluate`, or a per-PR results file (.jsonl)
+
+    Returns:
+        Summary dictionary with details
+    """
+    if path.endswith(".jsonl"):
+        with open(path, 'r', encoding='utf-8') as f:
+            details = [json.loads(line) for line in f if line.strip()]
+        return {"total_files": len(details), "details": details}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_shard_results(paths: List[str]) -> Dict[str, Any]:
+    """
+    Merge shard outputs into one summary.
+
+    Raises:
+        ValueError: If a PR was evaluated by more than one shard
+    """
+    scoreboard = Scoreboard()
+    seen = {}
+    for path in paths:
+        summary = load_shard_output(path)
+        for result in summary.get("details", []):
+            pr_url = result.get("github_pr_url")
+            if pr_url in seen:
+                raise ValueError(f"{pr_url} appears in both {seen[pr_url]} and {path}")
+            seen[pr_url] = path
+        scoreboard.add_summary(summary)
+    return scoreboard.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge sharded evaluation results")
+    parser.add_argument("inputs", nargs="+", help="shard summary (.json) or per-PR results (.jsonl) files")
+    parser.add_argument("-o", "--output", default="./results/evaluation_results.json", help="merged summary file")
+    args = parser.parse_args()
+
+    summary = merge_shard_results(args.inputs)
+    os.makedirs(Path(args.output).parent, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"Merged {len(args.inputs)} shards: {summary['evaluated_files']}/{summary['total_files']} files evaluated")
+    print(f"Semantic Match Rate: {summary['overall_semantic_match_rate']:.2%}")
+    print(f"Semantic Recall: {summary['overall_semantic_recall']:.2%}")
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
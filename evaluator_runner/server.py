@@ -0,0 +1,499 @@
+"""
+Evaluation Service
+
+Long-running HTTP service for evaluating generated review comments. The
+reference data index, the matcher clients and a cache of semantic verdicts
+stay in memory across requests, so a request only pays for the semantic calls
+it actually needs.
+
+Usage:
+    python evaluator_runner/server.py --port 8080
+
+Endpoints:
+    POST /evaluate  Evaluate the comments of one or more PRs, given as JSON or
+                    as multipart comment files; results are streamed back as
+                    NDJSON in completion order, followed by a summary line
+    GET  /health    Dataset, queue, verdict cache, endpoint and hedging statistics
+
+JSON request:
+    {
+        "priority": 10,                          # optional, higher runs first
+        "stream": true,                          # optional, false returns one JSON summary
+        "config": {"line_distance_threshold": 1, # optional overrides
+                   "semantic_matcher_type": "llm",
+                   "enable_semantic_match": true,
+                   "cascade_accept_threshold": 0.9,
+                   "cascade_reject_threshold": 0.5},
+        "prs": [{"github_pr_url": "https://github.com/...", "comments": [...] or "<path>...</notesplit />"},
+                {"file_name": "comments_repo_123.txt", "comments": "..."}]
+    }
+
+Multipart request: one file part per comments file (the PR is inferred from
+the file name, e.g. comments_{repo}_{pr_number}.txt, as in example_test.py),
+optional form fields priority, stream and the config overrides above.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import uvicorn
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+from evaluator_runner.core.evaluator import (
+    get_evaluator_ans_from_json,
+    parse_generated_comments_file,
+    parse_github_pr_url,
+)
+from evaluator_runner.core.matcher_factory import get_matcher_stats, get_semantic_matcher
+from evaluator_runner.core.scoreboard import Scoreboard
+from evaluator_runner.core.verdict_cache import VerdictCache
+from evaluator_runner.utils.config import EvaluatorConfig, SemanticMatcherType
+
+# Largest accepted request body
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """Invalid request, answered with the given HTTP status"""
+
+    def __init__(self, status: int, message: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+
+class DatasetIndex:
+    """Reference and negative data indexed by PR URL and by comments file name"""
+
+    def __init__(self, reference_path: str, negative_path: Optional[str] = None):
+        self.references = self._load(reference_path)
+        self.negatives = self._load(negative_path) if negative_path else None
+        self.by_file_stem = {}
+        for pr_url in self.references:
+            parsed = parse_github_pr_url(pr_url)
+            self.by_file_stem[f"{parsed['repo']}_{parsed['pr_number']}".lower()] = pr_url
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Dict[str, Any]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {item["githubPrUrl"]: item for item in json.load(f)}
+
+    def resolve_file_name(self, file_name: str) -> Optional[str]:
+        """PR URL of a comments file named comments_{repo}_{pr_number}.txt"""
+        stem = Path(file_name).stem.lower()
+        if stem.startswith("comments_"):
+            stem = stem[len("comments_"):]
+        return self.by_file_stem.get(stem)
+
+
+@dataclasses.dataclass(order=True)
+class Job:
+    """One PR evaluation waiting in the priority queue"""
+    sort_key: Tuple[int, int]
+    pr_url: str = dataclasses.field(compare=False)
+    comments: List[Dict[str, Any]] = dataclasses.field(compare=False)
+    config: EvaluatorConfig = dataclasses.field(compare=False)
+    results: "asyncio.Queue" = dataclasses.field(compare=False)
+    cancelled: bool = dataclasses.field(default=False, compare=False)
+    task: Optional[asyncio.Task] = dataclasses.field(default=None, compare=False)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+
+
+class EvaluationService:
+    """
+    Warm evaluation state shared by all requests.
+
+    PR evaluations are queued as jobs in a bounded priority queue (higher
+    priority first, FIFO within a priority) and run by a fixed number of
+    workers. A request that does not fit in the queue is rejected as a whole
+    so that clients can retry later instead of waiting unboundedly.
+    """
+
+    def __init__(self, index: DatasetIndex, config: EvaluatorConfig, workers: int = 8,
+                 max_queue: int = 1000, cache: Optional[VerdictCache] = None):
+        self.index = index
+        self.config = config
+        self.workers = workers
+        self.queue: "asyncio.PriorityQueue[Job]" = asyncio.PriorityQueue(max_queue)
+        self.cache = cache or VerdictCache()
+        self.running = 0
+        self.evaluated = 0
+        self.started = time.monotonic()
+        self._sequence = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+
+    def warm_up(self):
+        """Construct the matcher clients before the first request needs them"""
+        if not self.config.enable_semantic_match:
+            return
+        from evaluator_runner.core import match_cascade, match_embedding, match_llm
+        modules = {
+            SemanticMatcherType.LLM: [match_llm],
+            SemanticMatcherType.EMBEDDING: [match_embedding],
+            SemanticMatcherType.CASCADE: [match_cascade, match_llm]
+        }
+        try:
+            for module in modules[self.config.semantic_matcher_type]:
+                module._get_matcher()
+        except Exception as e:
+            print(f"Matcher client not ready ({e}), requests needing it will fail")
+
+    async def start(self):
+        self.warm_up()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, prs: List[Tuple[str, List[Dict[str, Any]]]], config: EvaluatorConfig,
+               priority: int) -> Tuple[List[Job], "asyncio.Queue"]:
+        """
+        Queue the evaluations of one request.
+
+        Returns:
+            The jobs and the queue their results are delivered to
+
+        Raises:
+            RequestError: 503 if the jobs do not fit in the queue
+        """
+        if self.queue.maxsize and self.queue.qsize() + len(prs) > self.queue.maxsize:
+            raise RequestError(503, f"Queue full ({self.queue.qsize()}/{self.queue.maxsize} jobs)",
+                               [(b"retry-after", b"5")])
+        results: "asyncio.Queue" = asyncio.Queue()
+        jobs = []
+        for pr_url, comments in prs:
+            job = Job((-priority, next(self._sequence)), pr_url, comments, config, results)
+            self.queue.put_nowait(job)
+            jobs.append(job)
+        return jobs, results
+
+    async def evaluate(self, pr_url: str, comments: List[Dict[str, Any]], config: EvaluatorConfig) -> Dict[str, Any]:
+        """Evaluate the comments of one PR against the warm reference data"""
+        ref_item = self.index.references.get(pr_url)
+        if ref_item is None:
+            return {"github_pr_url": pr_url, "skipped": True, "skip_reason": "No reference data found"}
+        if not comments:
+            return {"github_pr_url": pr_url, "skipped": True, "skip_reason": "No valid comments found"}
+        negative_comments = None
+        if self.index.negatives is not None:
+            negative_item = self.index.negatives.get(pr_url)
+            negative_comments = negative_item.get("comments", []) if negative_item else []
+        semantic_match_func = None
+        if config.enable_semantic_match:
+            semantic_match_func = self.cache.wrap(
+                config.semantic_matcher_type, get_semantic_matcher(config.semantic_matcher_type)
+            )
+        return await get_evaluator_ans_from_json(
+            github_pr_url=pr_url,
+            generated_comments=comments,
+            good_comments=ref_item.get("comments", []),
+            config=config,
+            pr_metadata={
+                "category": ref_item.get("category"),
+                "project_main_language": ref_item.get("project_main_language"),
+            },
+            bad_comments=negative_comments,
+            semantic_match_func=semantic_match_func,
+        )
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                continue
+            self.running += 1
+            job.task = asyncio.create_task(self.evaluate(job.pr_url, job.comments, job.config))
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if not job.cancelled:
+                    # the worker itself is being stopped
+                    job.task.cancel()
+                    raise
+                continue
+            except Exception as e:
+                result = {"github_pr_url": job.pr_url, "error": str(e)}
+            finally:
+                self.running -= 1
+            self.evaluated += 1
+            result.setdefault("github_pr_url", job.pr_url)
+            job.results.put_nowait(result)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "references": len(self.index.references),
+            "negatives": len(self.index.negatives) if self.index.negatives is not None else None,
+            "workers": self.workers,
+            "queued": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "running": self.running,
+            "evaluated": self.evaluated,
+            "verdict_cache": self.cache.stats(),
+            "matchers": get_matcher_stats()
+        }
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _parse_multipart(body: bytes, boundary: bytes) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+    """Split a multipart body into form fields and (file name, content) files"""
+    parts = []
+    current = {}
+
+    def on_part_begin():
+        current.clear()
+        current.update(headers={}, data=bytearray(), field=b"")
+
+    def on_header_field(data, start, end):
+        current["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        name = current["field"].lower()
+        current["headers"][name] = current["headers"].get(name, b"") + data[start:end]
+
+    def on_header_end():
+        current["field"] = b""
+
+    def on_part_data(data, start, end):
+        current["data"] += data[start:end]
+
+    def on_part_end():
+        parts.append((dict(current["headers"]), bytes(current["data"])))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field,
+        "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_part_data": on_part_data, "on_part_end": on_part_end,
+    })
+    parser.write(body)
+    parser.finalize()
+
+    fields, files = {}, []
+    for headers, data in parts:
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8")
+        if b"filename" in options:
+            files.append((options[b"filename"].decode("utf-8"), data.decode("utf-8", errors="replace")))
+        else:
+            fields[name] = data.decode("utf-8", errors="replace")
+    return fields, files
+
+
+class EvaluationApp:
+    """ASGI application of the evaluation service"""
+
+    def __init__(self, service: EvaluationService):
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            try:
+                await self._route(scope, receive, send)
+            except RequestError as e:
+                await self._send_json(send, e.status, {"error": str(e)}, e.headers)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.service.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.service.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route(self, scope, receive, send):
+        path, method = scope["path"].rstrip("/"), scope["method"]
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Use GET")
+            await self._send_json(send, 200, self.service.health())
+        elif path == "/evaluate":
+            if method != "POST":
+                raise RequestError(405, "Use POST")
+            await self._evaluate(scope, receive, send)
+        else:
+            raise RequestError(404, f"Unknown path {scope['path']}")
+
+    async def _read_body(self, receive) -> bytes:
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise RequestError(499, "Client disconnected")
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                raise RequestError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+            if not message.get("more_body"):
+                return bytes(body)
+
+    def _build_config(self, overrides: Dict[str, Any]) -> EvaluatorConfig:
+        changes = {}
+        try:
+            if overrides.get("line_distance_threshold") is not None:
+                changes["line_distance_threshold"] = int(overrides["line_distance_threshold"])
+            if overrides.get("semantic_matcher_type") is not None:
+                changes["semantic_matcher_type"] = SemanticMatcherType(overrides["semantic_matcher_type"])
+            if overrides.get("enable_semantic_match") is not None:
+                changes["enable_semantic_match"] = _parse_bool(overrides["enable_semantic_match"])
+            for key in ("cascade_accept_threshold", "cascade_reject_threshold"):
+                if overrides.get(key) is not None:
+                    changes[key] = float(overrides[key])
+            return dataclasses.replace(self.service.config, **changes)
+        except ValueError as e:
+            raise RequestError(400, f"Invalid config: {e}") from None
+
+    def _resolve(self, pr: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        pr_url = pr.get("github_pr_url") or self.service.index.resolve_file_name(pr.get("file_name", ""))
+        if not pr_url:
+            raise RequestError(400, f"Cannot match a PR URL for {pr.get('file_name') or 'an entry without URL'}")
+        comments = pr.get("comments", [])
+        if isinstance(comments, str):
+            comments = parse_generated_comments_file(comments)
+        if not isinstance(comments, list):
+            raise RequestError(400, f"comments of {pr_url} must be a list or the comments file text")
+        return pr_url, comments
+
+    def _parse_request(self, scope, body: bytes) -> Tuple[list, EvaluatorConfig, int, bool]:
+        headers = dict(scope["headers"])
+        content_type, options = parse_options_header(headers.get(b"content-type", b""))
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        if content_type == b"multipart/form-data":
+            if b"boundary" not in options:
+                raise RequestError(400, "Missing multipart boundary")
+            fields, files = _parse_multipart(body, options[b"boundary"])
+            request = {**fields, **query}
+            prs = [{"file_name": name, "comments": text} for name, text in files]
+            overrides = request
+        else:
+            try:
+                request = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                raise RequestError(400, f"Invalid JSON: {e}") from None
+            request.update(query)
+            prs = request.get("prs", [])
+            overrides = request.get("config") or {}
+        if not prs:
+            raise RequestError(400, "No PRs to evaluate")
+        try:
+            priority = int(request.get("priority", 0))
+        except ValueError:
+            raise RequestError(400, "priority must be an integer") from None
+        resolved = [self._resolve(pr) for pr in prs]
+        return resolved, self._build_config(overrides), priority, _parse_bool(request.get("stream", True))
+
+    async def _evaluate(self, scope, receive, send):
+        body = await self._read_body(receive)
+        prs, config, priority, stream = self._parse_request(scope, body)
+        jobs, results = self.service.submit(prs, config, priority)
+
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        scoreboard = Scoreboard()
+        try:
+            if stream:
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(b"content-type", b"application/x-ndjson")]})
+            for _ in jobs:
+                get = asyncio.create_task(results.get())
+                await asyncio.wait([get, watcher], return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.is_set():
+                    get.cancel()
+                    return
+                result = get.result()
+                scoreboard.add(result)
+                if stream:
+                    await self._send_line(send, {"event": "result", "github_pr_url": result.get("github_pr_url"),
+                                                 "result": result})
+            summary = scoreboard.summary(include_details=not stream)
+            if stream:
+                await self._send_line(send, {"event": "summary", **summary})
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            else:
+                await self._send_json(send, 200, summary)
+        finally:
+            # no leaked work for a client that went away or a failed send
+            for job in jobs:
+                job.cancel()
+            watcher.cancel()
+
+    @staticmethod
+    async def _send_line(send, payload: Dict[str, Any]):
+        line = json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+        await send({"type": "http.response.body", "body": line, "more_body": True})
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Dict[str, Any],
+                         headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())] + (headers or [])})
+        await send({"type": "http.response.body", "body": body})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the evaluation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--reference", default="../dataset/positive_samples.json", help="reference data file")
+    parser.add_argument("--negative", default="../dataset/negative_samples.json",
+                        help="negative reference data file, empty to skip false-positive scoring")
+    parser.add_argument("--matcher", default="llm", choices=[t.value for t in SemanticMatcherType],
+                        help="default semantic matcher type")
+    parser.add_argument("--line-distance-threshold", type=int, default=1)
+    parser.add_argument("--cascade-accept-threshold", type=float, default=0.9,
+                        help="cascade matcher: embedding similarity accepted without the LLM")
+    parser.add_argument("--cascade-reject-threshold", type=float, default=0.5,
+                        help="cascade matcher: embedding similarity rejected without the LLM")
+    parser.add_argument("--location-only", action="store_true", help="disable semantic matching by default")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent PR evaluations")
+    parser.add_argument("--max-queue", type=int, default=1000, help="queued PR evaluations before rejecting requests")
+    parser.add_argument("--cache-size", type=int, default=100000, help="semantic verdicts kept in memory")
+    args = parser.parse_args()
+
+    index = DatasetIndex(args.reference, args.negative or None)
+    config = EvaluatorConfig(
+        line_distance_threshold=args.line_distance_threshold,
+        semantic_matcher_type=SemanticMatcherType(args.matcher),
+        enable_semantic_match=not args.location_only,
+        cascade_accept_threshold=args.cascade_accept_threshold,
+        cascade_reject_threshold=args.cascade_reject_threshold,
+    )
+    service = EvaluationService(index, config, args.workers, args.max_queue, VerdictCache(args.cache_size))
+    print(f"Loaded {len(index.references)} reference PRs"
+          + (f", {len(index.negatives)} negative reference PRs" if index.negatives is not None else ""))
+    uvicorn.run(EvaluationApp(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
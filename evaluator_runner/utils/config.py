@@ -11,6 +11,7 @@ class SemanticMatcherType(Enum):
     """Semantic matcher type"""
     LLM = "llm"
     EMBEDDING = "embedding"
+    CASCADE = "cascade"
 
 class PRCategory(Enum):
     """PR category"""
@@ -109,19 +110,35 @@ class EvaluatorConfig:
         line_distance_threshold: Line number matching distance threshold
             - 0: Must completely overlap
             - n: Allow up to n lines of distance difference
-        semantic_matcher_type: Semantic matcher type (LLM or EMBEDDING)
+        semantic_matcher_type: Semantic matcher type (LLM, EMBEDDING or CASCADE)
         enable_semantic_match: Whether to enable semantic matching
             - False: Only perform location matching
         filter_config: Data filtering configuration
+        enable_comment_dedup: Whether to collapse near-duplicate generated comments
+            in the same file and semantically judge one representative per cluster
+        dedup_similarity_threshold: Minimum estimated Jaccard similarity (0-1]
+            for two generated comments to be treated as near-duplicates
+        cascade_accept_threshold: CASCADE only, embedding similarity at or above
+            which a pair is accepted without an LLM call
+        cascade_reject_threshold: CASCADE only, embedding similarity below which
+            a pair is rejected without an LLM call
     """
     line_distance_threshold: int = 1
     semantic_matcher_type: SemanticMatcherType = SemanticMatcherType.LLM
     enable_semantic_match: bool = True
     filter_config: Optional[FilterConfig] = None
+    enable_comment_dedup: bool = False
+    dedup_similarity_threshold: float = 0.8
+    cascade_accept_threshold: float = 0.9
+    cascade_reject_threshold: float = 0.5
 
     def __post_init__(self):
         if self.line_distance_threshold < 0:
             raise ValueError("line_distance_threshold must be a non-negative integer")
+        if not 0 < self.dedup_similarity_threshold <= 1:
+            raise ValueError("dedup_similarity_threshold must be in (0, 1]")
+        if not -1 <= self.cascade_reject_threshold <= self.cascade_accept_threshold <= 1:
+            raise ValueError("cascade thresholds must satisfy -1 <= reject <= accept <= 1")
 
     @classmethod
     def with_embedding(cls, line_distance_threshold: int = 1) -> "EvaluatorConfig":
@@ -131,6 +148,21 @@ class EvaluatorConfig:
             semantic_matcher_type=SemanticMatcherType.EMBEDDING
         )
 
+    @classmethod
+    def with_cascade(
+        cls,
+        accept_threshold: float = 0.9,
+        reject_threshold: float = 0.5,
+        line_distance_threshold: int = 1
+    ) -> "EvaluatorConfig":
+        """Create config with the embedding-then-LLM cascade matcher"""
+        return cls(
+            line_distance_threshold=line_distance_threshold,
+            semantic_matcher_type=SemanticMatcherType.CASCADE,
+            cascade_accept_threshold=accept_threshold,
+            cascade_reject_threshold=reject_threshold
+        )
+
     @classmethod
     def location_only(cls, line_distance_threshold: int = 1) -> "EvaluatorConfig":
         """Create config for location-only matching"""
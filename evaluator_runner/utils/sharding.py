@@ -0,0 +1,121 @@
+"""
+Sharding Module
+
+Deterministic assignment of PRs to shards, shared by the agent runner and
+the evaluator so that every node computes the same split.
+"""
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(spec: str) -> Shard:
+    """
+    Parse a shard spec.
+
+    Args:
+        spec: "i/N" with 1 <= i <= N, e.g. "2/4"
+
+    Returns:
+        (i, N)
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard spec '{spec}', expected i/N") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard spec '{spec}', expected 1 <= i <= N")
+    return index, count
+
+
+def shard_suffix(shard: Shard) -> str:
+    """File name suffix of a shard, e.g. shard-2-of-4"""
+    return f"shard-{shard[0]}-of-{shard[1]}"
+
+
+def shard_path(path: str, shard: Shard) -> str:
+    """Per-shard variant of an output path, e.g. results.json -> results.shard-2-of-4.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{shard_suffix(shard)}{ext}"
+
+
+def shard_paths(path: str) -> List[str]:
+    """Existing per-shard variants of an output path, sorted by shard number"""
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.shard-(\d+)-of-\d+" + re.escape(ext) + "$")
+    directory = os.path.dirname(path) or "."
+    if not os.path.isdir(directory):
+        return []
+    matches = [(int(m.group(1)), name) for name in os.listdir(directory) if (m := pattern.match(name))]
+    return [os.path.join(os.path.dirname(path), name) for _, name in sorted(matches)]
+
+
+def stable_hash(key: str) -> int:
+    """Hash that is stable across processes and machines (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_of(key: str, count: int) -> int:
+    """1-based shard of a key under plain hash assignment"""
+    return stable_hash(key) % count + 1
+
+
+def assign_shards(
+    keys: Sequence[str],
+    count: int,
+    weights: Optional[Sequence[float]] = None
+) -> Dict[str, int]:
+    """
+    Assign keys to 1-based shards.
+
+    Without weights each key goes to its hash shard, so the assignment of a PR
+    does not depend on the rest of the dataset. With weights the keys are
+    placed heaviest first on the least loaded shard (ties broken by hash and
+    shard number), which balances the total weight per shard; every node must
+    then use the same dataset.
+
+    Args:
+        keys: Unique keys, e.g. PR URLs
+        count: Number of shards
+        weights: Optional weight per key, e.g. change_line_count
+
+    Returns:
+        Dictionary mapping key to shard
+    """
+    if weights is None:
+        return {key: shard_of(key, count) for key in keys}
+    loads = [0.0] * count
+    assignment = {}
+    order = sorted(range(len(keys)), key=lambda i: (-weights[i], stable_hash(keys[i]), keys[i]))
+    for i in order:
+        shard = min(range(count), key=lambda s: (loads[s], s))
+        loads[shard] += weights[i]
+        assignment[keys[i]] = shard + 1
+    return assignment
+
+
+def select_shard(
+    items: Sequence[T],
+    shard: Shard,
+    key: Callable[[T], str],
+    weight: Optional[Callable[[T], float]] = None
+) -> List[T]:
+    """
+    Keep the items of one shard, in their original order.
+
+    Args:
+        items: Items to split
+        shard: (i, N) as returned by parse_shard
+        key: Stable key of an item, e.g. its PR URL
+        weight: Optional weight of an item, enables balanced assignment
+    """
+    index, count = shard
+    keys = [key(item) for item in items]
+    weights = [weight(item) for item in items] if weight is not None else None
+    assignment = assign_shards(keys, count, weights)
+    return [item for item, k in zip(items, keys) if assignment[k] == index]